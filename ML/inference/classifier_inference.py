@@ -1,13 +1,14 @@
 import modal
 import torch
 import torch.nn as nn
-from transformers import XLMRobertaPreTrainedModel, XLMRobertaModel, AutoTokenizer
+from transformers import XLMRobertaPreTrainedModel, XLMRobertaModel, AutoConfig, AutoTokenizer
 from transformers.modeling_outputs import ModelOutput
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from typing import NamedTuple, Optional, Tuple
+import asyncio
 import json
 import os
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 
 # ==============================================================================
 # 1. CONFIGURATION & CONSTANTS
@@ -31,6 +32,39 @@ _INTENTS = [
 
 REMOTE_MODEL_DIR = "/model/joint_nlu_model_sota"
 
+# ONNX export artifacts (written by `export_onnx`, stored next to the weights)
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model.int8.onnx"
+ONNX_OPSET = 17
+SAFETENSORS_FILE = "model.safetensors"
+NUM_THREADS = 2  # match the Modal CPU allocation below
+TRACE_MAX_LENGTH = 128
+
+# Micro-batching of concurrent predict calls
+MAX_BATCH_SIZE = 8
+BATCH_WAIT_SECONDS = 0.005
+
+# BIO slot label kinds
+SLOT_OUTSIDE, SLOT_BEGIN, SLOT_INSIDE = 0, 1, 2
+_SLOT_OUTSIDE_ENTRY = (SLOT_OUTSIDE, None)
+
+
+class Entity(NamedTuple):
+    """A decoded slot span."""
+    type: str
+    start: int
+    end: int
+    value: str
+
+
+def _parse_slot_label(label: str) -> tuple[int, Optional[str]]:
+    """Split a BIO label like 'B-place_name' into (kind, entity type)."""
+    if label.startswith('B-'):
+        return SLOT_BEGIN, label[2:]
+    if label.startswith('I-'):
+        return SLOT_INSIDE, label[2:]
+    return _SLOT_OUTSIDE_ENTRY
+
 # ==============================================================================
 # 2. MODEL DEFINITION
 # ==============================================================================
@@ -73,7 +107,11 @@ class XLMRobertaForJointNLU(XLMRobertaPreTrainedModel):
         # slots
         sequence_output = self.dropout(sequence_output)
         slot_logits = self.slot_classifier(sequence_output)
-        
+
+        # inference only needs the logits; skip building the ModelOutput
+        if not self.training:
+            return intent_logits, slot_logits
+
         return JointNLUOutput(
             intent_logits=intent_logits,
             slot_logits=slot_logits,
@@ -81,13 +119,59 @@ class XLMRobertaForJointNLU(XLMRobertaPreTrainedModel):
             attentions=outputs.attentions
         )
 
+def _load_weights(model_dir: str) -> XLMRobertaForJointNLU:
+    """
+    Load the joint model, mmap-reading safetensors weights when available.
+
+    The model is built on the meta device, so no random init runs, and
+    `assign=True` adopts the loaded tensors as its parameters. Attention uses
+    the fused scaled_dot_product_attention kernel rather than eager attention.
+    """
+    weights_path = os.path.join(model_dir, SAFETENSORS_FILE)
+    if not os.path.exists(weights_path):
+        # legacy pytorch_model.bin checkpoint (see `export_safetensors`)
+        return XLMRobertaForJointNLU.from_pretrained(model_dir, attn_implementation="sdpa")
+
+    from safetensors.torch import load_file
+
+    config = AutoConfig.from_pretrained(model_dir, attn_implementation="sdpa")
+    with torch.device("meta"):
+        model = XLMRobertaForJointNLU(config)
+    model.load_state_dict(load_file(weights_path, device="cpu"), assign=True)
+
+    # the embeddings' position/token-type id buffers are not saved in the
+    # checkpoint, so they are still on meta; rebuild them on CPU
+    embeddings = model.roberta.embeddings
+    position_ids = torch.arange(config.max_position_embeddings).expand((1, -1))
+    embeddings.register_buffer("position_ids", position_ids, persistent=False)
+    embeddings.register_buffer(
+        "token_type_ids", torch.zeros_like(position_ids), persistent=False
+    )
+    return model
+
+
+def _ipex_optimize(model):
+    """
+    Apply Intel Extension for PyTorch bf16 kernels when it is installed.
+
+    IPEX pins an exact torch release, so it is not part of the default image;
+    without it the model is returned unchanged.
+    """
+    try:
+        import intel_extension_for_pytorch as ipex
+    except ImportError:
+        return model
+    return ipex.optimize(model, dtype=torch.bfloat16, inplace=True)
+
 # ==============================================================================
 # 3. MODAL APP SETUP
 # ==============================================================================
 
 image = (
     modal.Image.debian_slim(python_version="3.12")
-    .pip_install("torch", "transformers", "numpy", "fastapi")
+    .pip_install(
+        "torch", "transformers", "numpy", "fastapi", "onnx", "onnxruntime", "orjson"
+    )
 )
 
 app = modal.App("joint-nlu-service")
@@ -104,17 +188,18 @@ vol = modal.Volume.from_name("ai-assistant")
 )
 @modal.concurrent(max_inputs=20)
 class ModelService:
-    @modal.enter()
-    def load_model(self):
-        print(f"Cold Start: Loading model from {REMOTE_MODEL_DIR}...")
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        
-        # load Tokenizer & Model
-        self.tokenizer = AutoTokenizer.from_pretrained(REMOTE_MODEL_DIR)
-        self.model = XLMRobertaForJointNLU.from_pretrained(REMOTE_MODEL_DIR)
-        self.model.to(self.device)
-        self.model.eval()
-        
+    @modal.enter(snap=True)
+    def load_artifacts(self):
+        """Device-independent loading, captured in the memory snapshot."""
+        print(f"Cold Start: Loading artifacts from {REMOTE_MODEL_DIR}...")
+        # set before any parallel work so the interop pool is never oversized
+        torch.set_num_threads(NUM_THREADS)
+        torch.set_num_interop_threads(1)
+
+        # load Tokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(REMOTE_MODEL_DIR, use_fast=True)
+        assert self.tokenizer.is_fast, "offset mapping requires the Rust tokenizer"
+
         # load Mappings
         with open(os.path.join(REMOTE_MODEL_DIR, 'label_mappings.json'), 'r') as f:
             mappings = json.load(f)
@@ -131,86 +216,326 @@ class ModelService:
         else:
             self.id2slot = {v: k for k, v in raw_slot_map.items()}
 
-        print(f"Model ready on {self.device}")
+        # (kind, entity type) per slot id, so decoding never parses BIO labels
+        self.slot_table = {
+            slot_id: _parse_slot_label(label) for slot_id, label in self.id2slot.items()
+        }
+
+        # prefer the INT8-quantized ONNX graph (see `export_onnx`); otherwise
+        # keep the PyTorch weights in host memory so restores skip the volume read
+        self.onnx_path = os.path.join(REMOTE_MODEL_DIR, ONNX_INT8_MODEL_FILE)
+        if os.path.exists(self.onnx_path):
+            self.model = None
+        else:
+            self.model = _load_weights(REMOTE_MODEL_DIR).eval()
+            assert self.model.roberta.config._attn_implementation == "sdpa"
+
+    @modal.enter(snap=False)
+    def load_model(self):
+        """Device-bound setup, run after every snapshot restore."""
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        self.session = None
+        if self.model is None:
+            import onnxruntime as ort
+
+            so = ort.SessionOptions()
+            so.intra_op_num_threads = NUM_THREADS
+            so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self.session = ort.InferenceSession(
+                self.onnx_path, sess_options=so, providers=["CPUExecutionProvider"]
+            )
+            self.device = "cpu"
+        else:
+            self.model.to(self.device)
+            if self.device == "cpu":
+                self.model = _ipex_optimize(self.model)
+            self.model = self._trace_model(self.model)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+
+        backend = "onnxruntime-int8" if self.session is not None else "torch"
+        print(f"Model ready on {self.device} ({backend})")
+
+    def _trace_model(self, model):
+        """Trace and freeze the encoder so TorchScript can fuse and constant-fold it."""
+        example = self.tokenizer(
+            "warmup",
+            return_tensors="pt",
+            padding="max_length",
+            max_length=TRACE_MAX_LENGTH,
+        ).to(self.device)
+        args = (example["input_ids"], example["attention_mask"])
+
+        # the autocast weight cache can't be baked into a traced graph
+        with (
+            torch.no_grad(),
+            torch.autocast(
+                device_type=self.device, dtype=torch.bfloat16, cache_enabled=False
+            ),
+        ):
+            traced = torch.jit.trace(model, args, strict=False)
+            traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+            # warm up so the profiling executor specializes and fuses the graph
+            for _ in range(2):
+                traced(*args)
+        return traced
+
+    def _forward(self, input_ids, attention_mask):
+        """Run the encoder and return (intent_logits, slot_logits) as tensors."""
+        if self.session is not None:
+            intent_logits, slot_logits = self.session.run(
+                None,
+                {
+                    "input_ids": input_ids.numpy(),
+                    "attention_mask": attention_mask.numpy(),
+                },
+            )
+            return torch.from_numpy(intent_logits), torch.from_numpy(slot_logits)
+
+        # bf16 autocast halves GEMM weight traffic; autocast keeps LayerNorm
+        # and softmax in fp32, and the logits are cast back before decoding
+        with (
+            torch.no_grad(),
+            torch.autocast(device_type=self.device, dtype=torch.bfloat16),
+        ):
+            intent_logits, slot_logits = self.model(input_ids, attention_mask)
+        return intent_logits.float(), slot_logits.float()
 
     @modal.method()
-    def predict(self, text: str):
-        # tokenize with offsets
-        inputs = self.tokenizer(
-            text,
-            return_tensors='pt',
+    async def predict(self, text: str):
+        # hand the text to the micro-batcher so concurrent inputs share
+        # a single forward pass instead of each running at batch=1
+        if self._batcher is None:
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._batch_loop())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _batch_loop(self):
+        """Coalesce queued predict calls into batches of up to MAX_BATCH_SIZE."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + BATCH_WAIT_SECONDS
+            while len(batch) < MAX_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                results = await asyncio.to_thread(self._predict_batch, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    @modal.method()
+    async def predict_batch(self, texts: list[str]) -> list[dict]:
+        # already a batch, run it directly instead of through the queue
+        return await asyncio.to_thread(self._predict_batch, texts)
+
+    def _predict_batch(self, texts: list[str]) -> list[dict]:
+        # tokenize with offsets; no padding or tensors from the tokenizer,
+        # the batch is padded by hand and offsets stay plain (start, end) ints
+        enc = self.tokenizer(
+            texts,
             truncation=True,
             max_length=128,
             return_offsets_mapping=True
-        ).to(self.device)
-        
-        offsets = inputs.pop('offset_mapping')[0]
-        
+        )
+        offsets = enc["offset_mapping"]
+        input_ids, attention_mask = self._pad_batch(enc["input_ids"])
+
         # inference
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            
-        # decode intent
-        intent_logits = outputs.intent_logits[0]
-        intent_probs = torch.softmax(intent_logits, dim=0)
-        intent_id = torch.argmax(intent_probs).item()
-        intent_confidence = intent_probs[intent_id].item()
-        
+        intent_logits, slot_logits = self._forward(input_ids, attention_mask)
+
+        # decode intents for the whole batch at once: one softmax + max,
+        # one host transfer
+        intent_confidences, intent_ids = torch.softmax(intent_logits, dim=-1).max(dim=-1)
+        intent_ids = intent_ids.tolist()
+        intent_confidences = intent_confidences.tolist()
+
+        return [
+            self._decode(
+                text,
+                intent_ids[row],
+                intent_confidences[row],
+                slot_logits[row],
+                offsets[row],
+            )
+            for row, text in enumerate(texts)
+        ]
+
+    def _pad_batch(self, sequences: list[list[int]]):
+        """Right-pad token id lists into (B, L) input_ids/attention_mask tensors."""
+        max_len = max(len(seq) for seq in sequences)
+        input_ids = torch.full(
+            (len(sequences), max_len), self.tokenizer.pad_token_id, dtype=torch.long
+        )
+        attention_mask = torch.zeros((len(sequences), max_len), dtype=torch.long)
+        for row, seq in enumerate(sequences):
+            input_ids[row, : len(seq)] = torch.as_tensor(seq, dtype=torch.long)
+            attention_mask[row, : len(seq)] = 1
+        return input_ids.to(self.device), attention_mask.to(self.device)
+
+    def _decode(
+        self,
+        text: str,
+        intent_id: int,
+        intent_confidence: float,
+        slot_logits,
+        offsets,
+    ) -> dict:
         # handle potential index error if list size mismatches config
         if intent_id in self.id2intent:
             intent = self.id2intent[intent_id]
         else:
             intent = f"unknown_id_{intent_id}"
 
-        # decode slots
-        slot_logits = outputs.slot_logits[0]
-        slot_preds = torch.argmax(slot_logits, dim=-1).cpu().numpy()
+        # decode slots, only over this row's real tokens (offsets are unpadded)
+        slot_preds = slot_logits[: len(offsets)].argmax(dim=-1).tolist()
         
         entities = []
-        current_entity = None
-        
-        for i, (slot_id, (start_char, end_char)) in enumerate(zip(slot_preds, offsets)):
+        slots = {}
+        current_type = None
+        current_start = current_end = 0
+
+        for slot_id, (start_char, end_char) in zip(slot_preds, offsets):
             if start_char == end_char: continue # Skip special tokens
-            
-            label = self.id2slot.get(slot_id, "O")
-            
-            if label.startswith('B-'):
-                if current_entity: entities.append(current_entity)
-                current_entity = {
-                    'type': label[2:],
-                    'start': start_char.item(),
-                    'end': end_char.item(),
-                    'value': text[start_char:end_char]
-                }
-            elif label.startswith('I-') and current_entity:
-                current_entity['end'] = end_char.item()
-                current_entity['value'] = text[current_entity['start']:end_char]
-            else:
-                if current_entity:
-                    entities.append(current_entity)
-                    current_entity = None
-                    
-        if current_entity: entities.append(current_entity)
-        
-        slots = {e['type']: e['value'] for e in entities}
-        
+
+            kind, slot_type = self.slot_table.get(slot_id, _SLOT_OUTSIDE_ENTRY)
+
+            if kind == SLOT_INSIDE and current_type is not None:
+                current_end = end_char
+                continue
+
+            # any other label closes the open entity
+            if current_type is not None:
+                value = text[current_start:current_end]
+                entities.append(Entity(current_type, current_start, current_end, value))
+                slots[current_type] = value
+                current_type = None
+
+            if kind == SLOT_BEGIN:
+                current_type, current_start, current_end = slot_type, start_char, end_char
+
+        if current_type is not None:
+            value = text[current_start:current_end]
+            entities.append(Entity(current_type, current_start, current_end, value))
+            slots[current_type] = value
+
         return {
             "text": text,
             "intent": intent,
-            "confidence": float(intent_confidence),
+            "confidence": intent_confidence,
             "slots": slots,
-            "entities": entities
+            "entities": [e._asdict() for e in entities]
         }
 
 
+@app.function(image=image, volumes={"/model": vol}, cpu=2.0, memory=4096, timeout=1800)
+def export_onnx():
+    """
+    One-off export of the PyTorch checkpoint to an INT8 ONNX graph.
+
+    Run with `modal run classifier_inference.py::export_onnx`. Writes
+    `model.onnx` (FP32) and `model.int8.onnx` (dynamic INT8 MatMul weights)
+    next to the checkpoint, where `ModelService.load_model` picks them up.
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    tokenizer = AutoTokenizer.from_pretrained(REMOTE_MODEL_DIR)
+    model = XLMRobertaForJointNLU.from_pretrained(REMOTE_MODEL_DIR).eval()
+
+    example = tokenizer("turn on the bedroom lights", return_tensors="pt")
+    fp32_path = os.path.join(REMOTE_MODEL_DIR, ONNX_MODEL_FILE)
+    int8_path = os.path.join(REMOTE_MODEL_DIR, ONNX_INT8_MODEL_FILE)
+
+    # in eval mode the model returns a plain (intent_logits, slot_logits) tuple
+    torch.onnx.export(
+        model,
+        (example["input_ids"], example["attention_mask"]),
+        fp32_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["intent_logits", "slot_logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "intent_logits": {0: "batch"},
+            "slot_logits": {0: "batch", 1: "sequence"},
+        },
+        opset_version=ONNX_OPSET,
+        dynamo=False,
+    )
+    quantize_dynamic(
+        fp32_path,
+        int8_path,
+        weight_type=QuantType.QInt8,
+        op_types_to_quantize=["MatMul"],
+    )
+    vol.commit()
+    print(f"Exported {fp32_path} and {int8_path}")
+
+
+@app.function(image=image, volumes={"/model": vol}, cpu=2.0, memory=4096, timeout=1800)
+def export_safetensors():
+    """
+    One-off conversion of the checkpoint to `model.safetensors`.
+
+    Run with `modal run classifier_inference.py::export_safetensors` so cold
+    starts can mmap the weights instead of unpickling `pytorch_model.bin`.
+    """
+    model = XLMRobertaForJointNLU.from_pretrained(REMOTE_MODEL_DIR)
+    model.save_pretrained(REMOTE_MODEL_DIR, safe_serialization=True)
+    vol.commit()
+    print(f"Exported {os.path.join(REMOTE_MODEL_DIR, SAFETENSORS_FILE)}")
+
+
 class UserInput(BaseModel):
-    text: str
+    # a single `text`, or a client-side batch of `texts` answered in order
+    text: Optional[str] = None
+    texts: Optional[list[str]] = None
+
+    @model_validator(mode="after")
+    def _one_of_text_or_texts(self):
+        # neither (or both) would reach predict with no input -> 422, not 500
+        if (self.text is None) == (self.texts is None):
+            raise ValueError("exactly one of `text` or `texts` is required")
+        return self
+
+# Handle to ModelService, reused across requests to the web endpoint
+_model_service = None
 
 @app.function(image=image)
 @modal.fastapi_endpoint(method="POST")
 def web_inference(item: UserInput):
-    service = ModelService()
-    return service.predict.remote(item.text)
+    import orjson
+    from fastapi import Response
+
+    global _model_service
+    if _model_service is None:
+        _model_service = ModelService()
+
+    if item.texts is not None:
+        result = {"results": _model_service.predict_batch.remote(item.texts)}
+    else:
+        result = _model_service.predict.remote(item.text)
+    # serialize once with orjson instead of FastAPI's jsonable_encoder + json
+    return Response(content=orjson.dumps(result), media_type="application/json")
 
 @app.local_entrypoint()
 def main():
@@ -1,23 +1,71 @@
+import asyncio
+import sys
 from typing import Any, Optional
 import httpx
+import orjson
 
 from .config import get_settings
 from .models import ClassificationResult
 
 
+# Connection pool for the classifier endpoint (HTTP/2 multiplexes turns over
+# one warm TLS connection instead of handshaking per cold connection)
+CLASSIFIER_POOL_LIMITS = httpx.Limits(
+    max_keepalive_connections=20,
+    max_connections=100,
+    keepalive_expiry=300.0,
+)
+
+
 class ModalClassifierClient:
     """Client for calling the Modal-deployed XLM-R classifier."""
 
     def __init__(self) -> None:
         self.settings = get_settings()
         self._client: Optional[httpx.AsyncClient] = None
+        # Dynamic batching (enabled by start_batching during app startup)
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        # Batch requests in flight (kept so they can be cancelled on close)
+        self._in_flight: set[asyncio.Task] = set()
 
     async def _get_client(self) -> httpx.AsyncClient:
         """Get or create HTTP client."""
         if self._client is None:
-            self._client = httpx.AsyncClient(timeout=self.settings.classifier_timeout)
+            self._client = httpx.AsyncClient(
+                timeout=self.settings.classifier_timeout,
+                transport=httpx.AsyncHTTPTransport(
+                    http2=True,
+                    retries=1,
+                    limits=CLASSIFIER_POOL_LIMITS,
+                ),
+            )
         return self._client
 
+    async def warmup(self) -> None:
+        """
+        Send one throwaway classification at startup.
+
+        Leaves a pooled connection for the first user turn to reuse and makes
+        Modal start (and warm up) a model container before real traffic.
+        """
+        if not self.settings.modal_classifier_url:
+            return
+
+        # Never raises; failures are logged and the result is discarded
+        await self._classify_batch([("ping", None)])
+
+    def start_batching(self) -> None:
+        """
+        Start coalescing concurrent classify calls into batched requests.
+
+        Must be called from a running event loop. Until this is called (e.g.
+        in scripts and tests) every classify call is sent on its own.
+        """
+        if self._batcher is None:
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._batch_loop())
+
     async def classify(
         self, text: str, context: Optional[dict[str, Any]] = None
     ) -> ClassificationResult:
@@ -31,13 +79,85 @@ class ModalClassifierClient:
         Returns:
             ClassificationResult with intent, confidence, slots, and entities
         """
+        if self._queue is None:
+            results = await self._classify_batch([(text, context)])
+            return results[0]
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, context, future))
+        return await future
+
+    async def _batch_loop(self) -> None:
+        """Drain the queue into batches of up to classifier_max_batch_size."""
+        loop = asyncio.get_running_loop()
+        max_batch = self.settings.classifier_max_batch_size
+        max_wait = self.settings.classifier_batch_wait_ms / 1000
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + max_wait
+            while len(batch) < max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Send without waiting, so a slow request doesn't hold up the next batch
+            task = asyncio.create_task(self._send_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send_batch(
+        self, batch: list[tuple[str, Optional[dict[str, Any]], asyncio.Future]]
+    ) -> None:
+        """Classify one drained batch and resolve its callers' futures."""
+        try:
+            results = await self._classify_batch(
+                [(text, context) for text, context, _ in batch]
+            )
+        except asyncio.CancelledError:
+            for _, _, future in batch:
+                future.cancel()
+            raise
+
+        # A short reply must not leave the remaining callers waiting forever
+        if len(results) < len(batch):
+            print(f"Classifier returned {len(results)} results for {len(batch)} inputs")
+            results.extend(
+                self._unclassified() for _ in range(len(batch) - len(results))
+            )
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _classify_batch(
+        self, items: list[tuple[str, Optional[dict[str, Any]]]]
+    ) -> list[ClassificationResult]:
+        """
+        Classify one or more inputs in a single request.
+
+        A single input uses the original `{"text", "context"}` payload; several
+        inputs are sent as `{"texts", "contexts"}` and answered with
+        `{"results": [...]}` in the same order. Never raises: failures map to
+        a low-confidence result for every input.
+        """
         try:
             client = await self._get_client()
 
             # Build request payload
-            payload = {"text": text}
-            if context:
-                payload["context"] = context
+            if len(items) == 1:
+                text, context = items[0]
+                payload: dict[str, Any] = {"text": text}
+                if context:
+                    payload["context"] = context
+            else:
+                payload = {
+                    "texts": [text for text, _ in items],
+                    "contexts": [context for _, context in items],
+                }
 
             # Call Modal endpoint
             response = await client.post(
@@ -46,47 +166,56 @@ class ModalClassifierClient:
             )
             response.raise_for_status()
 
-            data = response.json()
+            data = orjson.loads(response.content)
             # print(f"[Classifier] Raw response: {data}")
 
-            # Map Modal response to normalized format
-            return ClassificationResult(
-                intent=data.get("intent"),
-                confidence=data.get("confidence", 0.0),
-                slots=data.get("slots", {}),
-                entities=data.get("entities", []),
-                needs_clarification=data.get("confidence", 0.0)
-                < self.settings.confidence_threshold,
-            )
+            if len(items) == 1:
+                return [self._to_result(data)]
+            return [self._to_result(result) for result in data["results"]]
 
         except httpx.TimeoutException:
             # Return low-confidence result on timeout
-            return ClassificationResult(
-                intent=None,
-                confidence=0.0,
-                needs_clarification=True,
-            )
+            return [self._unclassified() for _ in items]
 
         except httpx.HTTPStatusError as e:
             # Log error and return empty result
             print(f"Classifier HTTP error: {e}")
-            return ClassificationResult(
-                intent=None,
-                confidence=0.0,
-                needs_clarification=True,
-            )
+            return [self._unclassified() for _ in items]
 
         except Exception as e:
             # Catch-all for unexpected errors
             print(f"Classifier error: {e}")
-            return ClassificationResult(
-                intent=None,
-                confidence=0.0,
-                needs_clarification=True,
-            )
+            return [self._unclassified() for _ in items]
+
+    def _to_result(self, data: dict[str, Any]) -> ClassificationResult:
+        """Map a Modal response to the normalized format."""
+        intent = data.get("intent")
+        return ClassificationResult(
+            # Interned so intent-table lookups compare by identity
+            intent=sys.intern(intent) if intent else intent,
+            confidence=data.get("confidence", 0.0),
+            slots=data.get("slots", {}),
+            entities=data.get("entities", []),
+            needs_clarification=data.get("confidence", 0.0)
+            < self.settings.confidence_threshold,
+        )
+
+    def _unclassified(self) -> ClassificationResult:
+        """Low-confidence result used when the classifier is unavailable."""
+        return ClassificationResult(
+            intent=None,
+            confidence=0.0,
+            needs_clarification=True,
+        )
 
     async def close(self) -> None:
-        """Close the HTTP client."""
+        """Stop the batcher and close the HTTP client."""
+        if self._batcher:
+            self._batcher.cancel()
+            self._batcher = None
+            self._queue = None
+        for task in list(self._in_flight):
+            task.cancel()
         if self._client:
             await self._client.aclose()
             self._client = None
@@ -9,6 +9,8 @@ class Settings(BaseSettings):
     # Modal Classifier Configuration
     modal_classifier_url: str = ""
     classifier_timeout: int = 10  # seconds
+    classifier_max_batch_size: int = 8  # concurrent classify calls per request
+    classifier_batch_wait_ms: int = 5  # how long to wait for a batch to fill
 
     # AssemblyAI Configuration
     assemblyai_api_key: str = ""  # Set via ASSEMBLYAI_API_KEY env var
@@ -33,6 +35,11 @@ class Settings(BaseSettings):
 
     # Intent Classification
     confidence_threshold: float = 0.5
+    classification_cache_size: int = 256  # cached results per user
+    classification_cache_ttl: float = 30.0  # seconds
+
+    # Tool Calling
+    tool_cache_size: int = 256  # cached read-only tool results
 
     # CORS Configuration
     cors_origins: list[str] = [
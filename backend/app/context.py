@@ -1,9 +1,52 @@
+import heapq
+from collections import OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
 from typing import Any, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
 from .models import Turn, ClassificationResult
-from .intent_slots import INTENT_SLOTS, SLOT_QUESTIONS
+from .intent_slots import INTENT_SLOT_ORDER
+
+
+# Slot name aliases (classifier slot name -> collected slot name)
+SLOT_ALIASES: Mapping[str, str] = MappingProxyType({
+    # Location (classifier uses place_name)
+    "place_name": "location",
+    
+    # DateTime (classifier uses date, time, timeofday)
+    "date": "datetime",
+    "time": "datetime",
+    "timeofday": "datetime",
+    
+    # Music (classifier uses song_name, artist_name, music_genre, music_album, playlist_name)
+    "song_name": "song",
+    "artist_name": "artist",
+    "music_genre": "genre",
+    "music_album": "album",
+    "playlist_name": "playlist",
+    "music_descriptor": "genre",  # Alternative genre indicator
+    
+    # Radio/Podcast (classifier uses radio_name, podcast_name, podcast_descriptor)
+    "radio_name": "station",
+    "podcast_name": "podcast_name",  # Same name
+    "podcast_descriptor": "podcast_name",
+    
+    # Audiobook (classifier uses audiobook_name, audiobook_author)
+    "audiobook_name": "book_name",
+    "audiobook_author": "author",
+    
+    # IoT devices (classifier uses device_type, house_place, color_type, change_amount)
+    "device_type": "device_name",
+    "house_place": "room",
+    "color_type": "color",
+    "change_amount": "brightness",  # For dimming/brightness
+    
+    # Coffee (classifier uses coffee_type, drink_type)
+    "coffee_type": "strength",
+    "drink_type": "strength",
+})
 
 
 class ConversationContext(BaseModel):
@@ -16,6 +59,9 @@ class ConversationContext(BaseModel):
     awaiting_slot: Optional[str] = None
     last_updated: datetime = Field(default_factory=datetime.now)
 
+    # Text of the most recent user turn, kept in sync by update()
+    _last_user_text: Optional[str] = None
+
     def update(self, user_input: str, classification: ClassificationResult) -> None:
         """
         Update context with new user input and classification.
@@ -25,6 +71,7 @@ class ConversationContext(BaseModel):
             classification: Result from the classifier
         """
         # Add user turn to history
+        self._last_user_text = user_input
         self.history.append(
             Turn(
                 role="user",
@@ -40,49 +87,12 @@ class ConversationContext(BaseModel):
             self.collected_slots = {}
             self.missing_slots = []
 
-        # Slot name aliases
-        SLOT_ALIASES = {
-            # Location (classifier uses place_name)
-            "place_name": "location",
-            
-            # DateTime (classifier uses date, time, timeofday)
-            "date": "datetime",
-            "time": "datetime",
-            "timeofday": "datetime",
-            
-            # Music (classifier uses song_name, artist_name, music_genre, music_album, playlist_name)
-            "song_name": "song",
-            "artist_name": "artist",
-            "music_genre": "genre",
-            "music_album": "album",
-            "playlist_name": "playlist",
-            "music_descriptor": "genre",  # Alternative genre indicator
-            
-            # Radio/Podcast (classifier uses radio_name, podcast_name, podcast_descriptor)
-            "radio_name": "station",
-            "podcast_name": "podcast_name",  # Same name
-            "podcast_descriptor": "podcast_name",
-            
-            # Audiobook (classifier uses audiobook_name, audiobook_author)
-            "audiobook_name": "book_name",
-            "audiobook_author": "author",
-            
-            # IoT devices (classifier uses device_type, house_place, color_type, change_amount)
-            "device_type": "device_name",
-            "house_place": "room",
-            "color_type": "color",
-            "change_amount": "brightness",  # For dimming/brightness
-            
-            # Coffee (classifier uses coffee_type, drink_type)
-            "coffee_type": "strength",
-            "drink_type": "strength",
-        }
-
         # Merge extracted slots with normalization
         if classification.slots:
+            set_slot = self.collected_slots.__setitem__
+            normalize = SLOT_ALIASES.get
             for key, value in classification.slots.items():
-                normalized_key = SLOT_ALIASES.get(key, key)
-                self.collected_slots[normalized_key] = value
+                set_slot(normalize(key, key), value)
 
         # Recalculate missing slots
         self._calculate_missing_slots()
@@ -95,10 +105,7 @@ class ConversationContext(BaseModel):
         Returns:
             Last user message or None if no user messages exist
         """
-        for turn in reversed(self.history):
-            if turn.role == "user":
-                return turn.text
-        return None
+        return self._last_user_text
     
     def get_history(self) -> list[Turn]:
         """
@@ -109,6 +116,15 @@ class ConversationContext(BaseModel):
         """
         return self.history
 
+    def get_history_and_last_user(self) -> tuple[list[Turn], Optional[str]]:
+        """
+        Get the conversation history together with the last user message.
+
+        Returns:
+            Tuple of (history, last user message or None)
+        """
+        return self.history, self._last_user_text
+
     def is_context_answer(self, text: str) -> bool:
         """
         Determine if the input is a slot-filling answer to a previous question.
@@ -131,14 +147,10 @@ class ConversationContext(BaseModel):
 
     def _calculate_missing_slots(self) -> None:
         """Calculate which required slots are still missing."""
-        if not self.current_intent:
-            self.missing_slots = []
-            return
-
-        slot_def = INTENT_SLOTS.get(self.current_intent, {"required": [], "optional": []})
-        required = slot_def["required"]
-
-        self.missing_slots = [slot for slot in required if slot not in self.collected_slots]
+        # INTENT_SLOT_ORDER lists the required slots in question order
+        required = INTENT_SLOT_ORDER.get(self.current_intent, ()) if self.current_intent else ()
+        collected = self.collected_slots
+        self.missing_slots = [slot for slot, _ in required if slot not in collected]
 
     def get_missing_slots(self) -> list[str]:
         """Get list of missing required slots."""
@@ -158,10 +170,13 @@ class ConversationContext(BaseModel):
         if not self.missing_slots:
             return None
 
-        next_slot = self.missing_slots[0]
-        self.awaiting_slot = next_slot
+        collected = self.collected_slots
+        for slot, question in INTENT_SLOT_ORDER.get(self.current_intent, ()):
+            if slot not in collected:
+                self.awaiting_slot = slot
+                return question
 
-        return SLOT_QUESTIONS.get(next_slot, f"Please provide {next_slot}.")
+        return None
 
     def add_assistant_turn(self, text: str, intent: Optional[str] = None) -> None:
         """Add an assistant response to history."""
@@ -197,14 +212,22 @@ class ConversationContext(BaseModel):
     def clear_all(self) -> None:
         """Clear entire context including history."""
         self.history = []
+        self._last_user_text = None
         self.reset()
 
 
 class ConversationContextManager:
     """Manages conversation contexts for multiple users."""
 
-    def __init__(self) -> None:
-        self._contexts: dict[str, ConversationContext] = {}
+    def __init__(self, max_contexts: int = 10_000) -> None:
+        # Contexts in least-recently-used order, capped at max_contexts
+        self._contexts: OrderedDict[str, ConversationContext] = OrderedDict()
+        self._max_contexts = max_contexts
+        # Min-heap of (last_updated timestamp, user_id) for expiry. Entries go
+        # stale as contexts are updated; cleanup validates them lazily against
+        # _heap_timestamps, which holds the one live entry per user.
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._heap_timestamps: dict[str, float] = {}
 
     def get_context(self, user_id: str) -> ConversationContext:
         """
@@ -216,10 +239,23 @@ class ConversationContextManager:
         Returns:
             ConversationContext for the user
         """
-        if user_id not in self._contexts:
-            self._contexts[user_id] = ConversationContext()
+        contexts = self._contexts
+        context = contexts.get(user_id)
+        if context is not None:
+            contexts.move_to_end(user_id)
+            return context
 
-        return self._contexts[user_id]
+        # Make room by dropping the least recently used context; its heap
+        # entry goes stale and is skipped by cleanup
+        if len(contexts) >= self._max_contexts:
+            evicted, _ = contexts.popitem(last=False)
+            del self._heap_timestamps[evicted]
+
+        context = ConversationContext()
+        contexts[user_id] = context
+        self._schedule_expiry(user_id, context.last_updated.timestamp())
+
+        return context
 
     def reset_context(self, user_id: str) -> None:
         """Reset context for a user."""
@@ -229,26 +265,44 @@ class ConversationContextManager:
     def remove_context(self, user_id: str) -> None:
         """Remove context entirely for a user."""
         self._contexts.pop(user_id, None)
+        self._heap_timestamps.pop(user_id, None)
 
     def cleanup_old_contexts(self, max_age_seconds: int = 1800) -> int:
         """
         Remove contexts older than max_age_seconds.
 
+        Only heap entries older than the cutoff are visited, so a sweep costs
+        O(k log n) for k candidates instead of scanning every context.
+
         Args:
             max_age_seconds: Maximum age in seconds (default 30 minutes)
 
         Returns:
             Number of contexts removed
         """
-        now = datetime.now()
-        to_remove = []
-
-        for user_id, context in self._contexts.items():
-            age = (now - context.last_updated).total_seconds()
-            if age > max_age_seconds:
-                to_remove.append(user_id)
-
-        for user_id in to_remove:
-            del self._contexts[user_id]
-
-        return len(to_remove)
+        cutoff = datetime.now().timestamp() - max_age_seconds
+        heap = self._expiry_heap
+        removed = 0
+
+        while heap and heap[0][0] < cutoff:
+            timestamp, user_id = heapq.heappop(heap)
+
+            # Superseded entry (context removed or rescheduled since)
+            if self._heap_timestamps.get(user_id) != timestamp:
+                continue
+
+            last_updated = self._contexts[user_id].last_updated.timestamp()
+            if last_updated < cutoff:
+                del self._contexts[user_id]
+                del self._heap_timestamps[user_id]
+                removed += 1
+            else:
+                # Context was used since it was scheduled, requeue at its real age
+                self._schedule_expiry(user_id, last_updated)
+
+        return removed
+
+    def _schedule_expiry(self, user_id: str, timestamp: float) -> None:
+        """Record the live expiry entry for a user."""
+        self._heap_timestamps[user_id] = timestamp
+        heapq.heappush(self._expiry_heap, (timestamp, user_id))
@@ -1,4 +1,7 @@
-from typing import Any
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional
 
 from .config import get_settings
 from .models import (
@@ -13,34 +16,99 @@ from .context import ConversationContext
 from .state_store import get_context_manager
 from .classifier_client import get_classifier_client
 from .intent_to_ui import get_ui_mode
-from .intent_slots import INTENT_SLOTS, WEATHER_INTENTS, MUSIC_INTENTS, IOT_INTENTS
+from .intent_slots import (
+    INTENT_SLOTS,
+    INTENTS_WITH_NO_REQUIRED,
+    WEATHER_INTENTS,
+    MUSIC_INTENTS,
+    IOT_INTENTS,
+)
 from .services import WeatherService, MusicService, IoTService, GeminiService, GroqService
 from .tool_executor import get_tool_executor
 
 
-class AssistantController:
-    """Main controller for processing user input and generating responses."""
+# Slots joined (in this order) into the music search query
+_MUSIC_QUERY_SLOTS = ("song", "artist", "genre")
 
-    def __init__(self, user_id: str = "default") -> None:
-        self.user_id = user_id
-        self.context_manager = get_context_manager()
-        self.classifier = get_classifier_client()
+
+# IoT intent -> device action (anything unlisted toggles)
+_IOT_ACTION: dict[str, str] = {
+    "iot_hue_lighton": "on",
+    "iot_wemo_on": "on",
+    "iot_hue_lightoff": "off",
+    "iot_wemo_off": "off",
+    "iot_hue_lightchange": "set",
+    "iot_hue_lightdim": "off",  # Dim = turn down
+    "iot_hue_lightup": "on",  # Brighten = turn up
+}
+
+
+class _SharedServices:
+    """Stateless services and LLM clients shared by every controller."""
+
+    def __init__(self) -> None:
         self.weather_service = WeatherService()
         self.music_service = MusicService()
-        self.iot_service = IoTService(user_id=user_id)
         self.gemini_service = GeminiService()
         self.llm_service = self._get_llm_service()
-        self.tool_executor = get_tool_executor()
-        self.settings = get_settings()
 
     def _get_llm_service(self):
         """Get the configured LLM service based on settings."""
-        settings = get_settings()
-        # print(f"[Controller] Using LLM provider: {settings.llm_provider}")
-        if settings.llm_provider == "groq":
+        # print(f"[Controller] Using LLM provider: {get_settings().llm_provider}")
+        if get_settings().llm_provider == "groq":
             return GroqService()
         else:
-            return GeminiService()
+            return self.gemini_service
+
+    async def aclose(self) -> None:
+        """Release the LLM clients."""
+        await self.gemini_service.aclose()
+        await self.llm_service.aclose()
+
+
+# Global instance
+_shared_services: Optional[_SharedServices] = None
+
+
+def _get_shared_services() -> _SharedServices:
+    """Get the shared services, creating them on first use."""
+    global _shared_services
+    if _shared_services is None:
+        _shared_services = _SharedServices()
+    return _shared_services
+
+
+class AssistantController:
+    """Main controller for processing user input and generating responses."""
+
+    def __init__(self, user_id: str = "default") -> None:
+        self.user_id = user_id
+        self.context_manager = get_context_manager()
+        self.classifier = get_classifier_client()
+        shared = _get_shared_services()
+        self.weather_service = shared.weather_service
+        self.music_service = shared.music_service
+        self.iot_service = IoTService(user_id=user_id)
+        self.settings = get_settings()
+        self.gemini_service = shared.gemini_service
+        self.llm_service = shared.llm_service
+        self.tool_executor = get_tool_executor()
+        # Provider is fixed for the process, so decide the general-turn path once
+        self._use_groq_tools = self.settings.llm_provider == "groq" and hasattr(
+            self.llm_service, "generate_response_with_tools"
+        )
+        # Recent classifications: key -> (monotonic time stored, result)
+        self._classification_cache: dict[tuple, tuple[float, ClassificationResult]] = {}
+
+        # Intent -> handler(context, slots); anything unlisted goes to _handle_general
+        self._dispatch: dict[str, Callable[..., Awaitable[AssistantResponse]]] = {
+            **{intent: self._handle_weather for intent in WEATHER_INTENTS},
+            **{intent: self._handle_music for intent in MUSIC_INTENTS},
+            **{
+                intent: partial(self._handle_iot, intent=intent)
+                for intent in IOT_INTENTS
+            },
+        }
 
     async def process_input(self, user_id: str, text: str) -> AssistantResponse:
         """
@@ -53,10 +121,6 @@ class AssistantController:
         Returns:
             AssistantResponse with ui_mode, ui_data, and response
         """
-        # Update user context
-        self.user_id = user_id
-        self.iot_service = IoTService(user_id=user_id)
-
         # Get or create context
         context = self.context_manager.get_context(user_id)
 
@@ -78,8 +142,8 @@ class AssistantController:
                 # print(f"[Controller] Low confidence or no intent, routing to GenAI")
                 return await self._handle_general(context, classification)
 
-            # Check if we need more slots
-            if not context.is_complete():
+            # Check if we need more slots (never for intents without required slots)
+            if context.current_intent not in INTENTS_WITH_NO_REQUIRED and not context.is_complete():
                 return self._build_slot_request(context, classification)
 
             # All slots collected - execute intent
@@ -87,7 +151,7 @@ class AssistantController:
 
         except Exception as e:
             print(f"Error processing input: {e}")
-            return AssistantResponse(
+            return AssistantResponse.model_construct(
                 response="I'm sorry, I encountered an error. Please try again.",
                 ui_mode="ai_response",
                 state="error",
@@ -98,6 +162,27 @@ class AssistantController:
         self, text: str, context: ConversationContext
     ) -> ClassificationResult:
         """Classify user input using Modal classifier."""
+        # Repeated text in the same dialogue state gets the same answer, so
+        # reuse recent results (long free-form text is not worth keeping)
+        key = None
+        if context.awaiting_slot or len(text) <= 128:
+            try:
+                key = (
+                    text,
+                    context.current_intent,
+                    context.awaiting_slot,
+                    frozenset(context.collected_slots.items()),
+                )
+            except TypeError:
+                pass  # Unhashable slot value, skip the cache
+
+        now = time.monotonic()
+        cache = self._classification_cache
+        if key is not None:
+            cached = cache.get(key)
+            if cached and now - cached[0] < self.settings.classification_cache_ttl:
+                return cached[1]
+
         # Build context dict for classifier
         context_dict = None
         if context.current_intent:
@@ -107,7 +192,16 @@ class AssistantController:
                 "awaiting_slot": context.awaiting_slot,
             }
 
-        return await self.classifier.classify(text, context_dict)
+        result = await self.classifier.classify(text, context_dict)
+
+        # Failed calls come back without an intent and should be retried
+        if key is not None and result.intent:
+            cache.pop(key, None)
+            cache[key] = (now, result)
+            if len(cache) > self.settings.classification_cache_size:
+                del cache[next(iter(cache))]
+
+        return result
 
     async def _handle_slot_filling(
         self,
@@ -131,8 +225,8 @@ class AssistantController:
             if slot_name not in context.collected_slots:
                 context.fill_slot(slot_name, slot_value)
 
-        # Check if we need more slots
-        if not context.is_complete():
+        # Check if we need more slots (never for intents without required slots)
+        if context.current_intent not in INTENTS_WITH_NO_REQUIRED and not context.is_complete():
             return self._build_slot_request(context, classification)
 
         # All slots collected - execute intent
@@ -185,17 +279,9 @@ class AssistantController:
         self, context: ConversationContext, classification: ClassificationResult
     ) -> AssistantResponse:
         """Execute the intent with collected slots."""
-        intent = context.current_intent
-        slots = context.collected_slots
-
-        if intent in WEATHER_INTENTS:
-            return await self._handle_weather(context, slots)
-
-        if intent in MUSIC_INTENTS:
-            return await self._handle_music(context, slots)
-
-        if intent in IOT_INTENTS:
-            return await self._handle_iot(context, slots, intent)
+        handler = self._dispatch.get(context.current_intent)
+        if handler:
+            return await handler(context, context.collected_slots)
 
         # General/fallback response - use GenAI
         return await self._handle_general(context, classification)
@@ -204,6 +290,7 @@ class AssistantController:
         self, context: ConversationContext, slots: dict[str, Any]
     ) -> AssistantResponse:
         """Handle weather intent."""
+        intent = context.current_intent  # reset() below clears it
         location = slots.get("location", "San Francisco")
 
         # Call weather service
@@ -213,7 +300,8 @@ class AssistantController:
         response = self.weather_service.generate_response(weather_data, location)
 
         # Build action
-        action = WeatherAction(
+        # Fields come from our own services, so skip validation
+        action = WeatherAction.model_construct(
             location=weather_data.get("location", location),
             temperature=weather_data.get("temperature"),
             condition=weather_data.get("condition"),
@@ -223,16 +311,16 @@ class AssistantController:
             forecast=weather_data.get("forecast"),
         )
 
-        context.add_assistant_turn(response, context.current_intent)
+        context.add_assistant_turn(response, intent)
         context.reset()  # Clear context after completion
 
-        return AssistantResponse(
+        return AssistantResponse.model_construct(
             response=response,
             ui_mode="weather",
             ui_data=weather_data,
             action=action,
             state="completed",
-            intent=context.current_intent,
+            intent=intent,
             slots=slots,
         )
 
@@ -240,18 +328,13 @@ class AssistantController:
         self, context: ConversationContext, slots: dict[str, Any]
     ) -> AssistantResponse:
         """Handle music intent."""
+        intent = context.current_intent  # reset() below clears it
         # print(f"[Controller._handle_music] Received slots: {slots}")
         
         # Build search query from slots
-        query_parts = []
-        if slots.get("song"):
-            query_parts.append(slots["song"])
-        if slots.get("artist"):
-            query_parts.append(slots["artist"])
-        if slots.get("genre"):
-            query_parts.append(slots["genre"])
-
-        query = " ".join(query_parts) if query_parts else slots.values() or "music"
+        query = " ".join(
+            value for slot in _MUSIC_QUERY_SLOTS if (value := slots.get(slot))
+        ) or "music"
         # print(f"[Controller._handle_music] Built query: '{query}'")
 
         # Call music service
@@ -261,7 +344,7 @@ class AssistantController:
         response = self.music_service.generate_response(music_data, query)
 
         # Build action
-        action = MusicAction(
+        action = MusicAction.model_construct(
             command="play",
             artist=music_data.get("artist"),
             song=music_data.get("title"),
@@ -287,16 +370,16 @@ class AssistantController:
             "playlist": music_data.get("playlist", []),
         }
 
-        context.add_assistant_turn(response, context.current_intent)
+        context.add_assistant_turn(response, intent)
         context.reset()
 
-        return AssistantResponse(
+        return AssistantResponse.model_construct(
             response=response,
             ui_mode="music",
             ui_data=ui_data,
             action=action,
             state="completed",
-            intent=context.current_intent,
+            intent=intent,
             slots=slots,
         )
 
@@ -305,18 +388,7 @@ class AssistantController:
     ) -> AssistantResponse:
         """Handle IoT intents."""
         # Determine action from intent
-        if "lighton" in intent or "wemo_on" in intent:
-            action_type = "on"
-        elif "lightoff" in intent or "wemo_off" in intent:
-            action_type = "off"
-        elif "lightchange" in intent:
-            action_type = "set"
-        elif "lightdim" in intent:
-            action_type = "off"  # Dim = turn down
-        elif "lightup" in intent:
-            action_type = "on"  # Brighten = turn up
-        else:
-            action_type = "toggle"
+        action_type = _IOT_ACTION.get(intent, "toggle")
 
         # Build device name from slots
         device_name = slots.get("device_name") or slots.get("room", "lights")
@@ -333,7 +405,7 @@ class AssistantController:
         response = self.iot_service.generate_response(result, action_type, device_name)
 
         # Build action
-        action = IoTAction(
+        action = IoTAction.model_construct(
             command=action_type,
             device_name=device_name,
             room=slots.get("room"),
@@ -345,10 +417,10 @@ class AssistantController:
         # Build ui_data matching SmartHomeWidget structure
         ui_data = {"devices": result.get("devices", [])}
 
-        context.add_assistant_turn(response, context.current_intent)
+        context.add_assistant_turn(response, intent)
         context.reset()
 
-        return AssistantResponse(
+        return AssistantResponse.model_construct(
             response=response,
             ui_mode="smart_home",
             ui_data=ui_data,
@@ -363,13 +435,12 @@ class AssistantController:
     ) -> AssistantResponse:
         """Handle general/greeting intents using configured LLM with tool calling."""
         intent = context.current_intent
-        user_message = context.get_last_user_message() or "Hello"
-
         # Get conversation history for context
-        history = context.get_history()
+        history, user_message = context.get_history_and_last_user()
+        user_message = user_message or "Hello"
 
         # Use Groq with tool calling if configured, otherwise fall back to GenAI
-        if self.settings.llm_provider == "groq" and hasattr(self.llm_service, 'generate_response_with_tools'):
+        if self._use_groq_tools:
             llm_response = await self.llm_service.generate_response_with_tools(
                 user_message=user_message,
                 tool_executor=self.tool_executor,
@@ -404,12 +475,12 @@ class AssistantController:
         response = llm_response.get("response", "How can I assist you?")
         suggestions = llm_response.get("suggestions", [])
 
-        action = GeneralAction(message=response)
+        action = GeneralAction.model_construct(message=response)
 
         context.add_assistant_turn(response, intent)
         context.reset()
 
-        return AssistantResponse(
+        return AssistantResponse.model_construct(
             response=response,
             ui_mode=ui_mode,
             ui_data=ui_data,
@@ -421,13 +492,33 @@ class AssistantController:
 
 
 
-# Global Controller Instance
-_controller: AssistantController | None = None
+# Controller Instances (one per user, least recently used first)
+_controllers: "OrderedDict[str, AssistantController]" = OrderedDict()
+
+# Controllers kept before the least recently used is dropped
+MAX_CONTROLLERS = 10_000
+
+
+def get_controller(user_id: str = "default") -> AssistantController:
+    """Get the controller instance for a user."""
+    # No await between lookup and insert, so this is safe on the event loop
+    controller = _controllers.get(user_id)
+    if controller is not None:
+        _controllers.move_to_end(user_id)
+        return controller
+
+    controller = _controllers[user_id] = AssistantController(user_id)
+    # user_id comes from the request, so bound memory by forgetting the
+    # least recently active user (clients are shared, nothing to close)
+    if len(_controllers) > MAX_CONTROLLERS:
+        _controllers.popitem(last=False)
+    return controller
 
 
-def get_controller() -> AssistantController:
-    """Get the global controller instance."""
-    global _controller
-    if _controller is None:
-        _controller = AssistantController()
-    return _controller
+async def close_controllers() -> None:
+    """Drop all cached controllers and close the shared LLM clients (called on app shutdown)."""
+    global _shared_services
+    _controllers.clear()
+    if _shared_services is not None:
+        shared, _shared_services = _shared_services, None
+        await shared.aclose()
@@ -0,0 +1,34 @@
+from typing import Optional
+import httpx
+
+
+# Shared pool for outbound API calls (weather, search, token, TTS) so repeat
+# calls reuse warm keep-alive connections instead of handshaking each time
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_keepalive_connections=20,
+    max_connections=100,
+)
+
+
+# Global instance
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared outbound HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(15.0),
+            limits=HTTP_POOL_LIMITS,
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (called on app shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        client, _http_client = _http_client, None
+        await client.aclose()
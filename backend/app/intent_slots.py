@@ -78,6 +78,14 @@ INTENT_SLOTS: dict[str, SlotDefinition] = {
 }
 
 
+# Intents that are complete as soon as they are classified
+INTENTS_WITH_NO_REQUIRED: frozenset[str] = frozenset(
+    intent for intent, slot_def in INTENT_SLOTS.items() if not slot_def["required"]
+)
+
+INTENTS_WITH_REQUIRED: frozenset[str] = frozenset(INTENT_SLOTS) - INTENTS_WITH_NO_REQUIRED
+
+
 # Slot Questions
 
 SLOT_QUESTIONS: dict[str, str] = {
@@ -104,15 +112,26 @@ SLOT_QUESTIONS: dict[str, str] = {
     "mode": "Which cleaning mode?",
 }
 
+# Follow-up questions per intent, in the order the required slots are asked
+INTENT_SLOT_ORDER: dict[str, tuple[tuple[str, str], ...]] = {
+    intent: tuple(
+        (slot, SLOT_QUESTIONS.get(slot, f"Please provide {slot}."))
+        for slot in slot_def["required"]
+    )
+    for intent, slot_def in INTENT_SLOTS.items()
+}
+
 
 
 # Intent Categories (for grouping)
 
-WEATHER_INTENTS = {"weather_query"}
+WEATHER_INTENTS: frozenset[str] = frozenset({"weather_query"})
 
-MUSIC_INTENTS = {"play_music", "play_radio", "play_podcasts", "play_audiobook"}
+MUSIC_INTENTS: frozenset[str] = frozenset(
+    {"play_music", "play_radio", "play_podcasts", "play_audiobook"}
+)
 
-IOT_INTENTS = {
+IOT_INTENTS: frozenset[str] = frozenset({
     "iot_hue_lighton",
     "iot_hue_lightoff",
     "iot_hue_lightchange",
@@ -122,6 +141,8 @@ IOT_INTENTS = {
     "iot_wemo_off",
     "iot_coffee",
     "iot_cleaning",
-}
+})
 
-GENERAL_INTENTS = {"general_greet", "general_joke", "general_quirky"}
+GENERAL_INTENTS: frozenset[str] = frozenset(
+    {"general_greet", "general_joke", "general_quirky"}
+)
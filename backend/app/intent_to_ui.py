@@ -9,38 +9,6 @@ UI_MODE_AI_RESPONSE = "ai_response"
 
 
 
-# Intent to UI Mode Mapping
-
-def get_ui_mode(intent: str | None) -> str:
-    """
-    Get the UI mode for a given intent.
-
-    Args:
-        intent: The classified intent string
-
-    Returns:
-        UI mode string for the frontend widget
-    """
-    if intent is None:
-        return UI_MODE_AI_RESPONSE
-
-    if intent in WEATHER_INTENTS:
-        return UI_MODE_WEATHER
-
-    if intent in MUSIC_INTENTS:
-        return UI_MODE_MUSIC
-
-    if intent in IOT_INTENTS:
-        return UI_MODE_SMART_HOME
-
-    if intent in GENERAL_INTENTS:
-        return UI_MODE_AI_RESPONSE
-
-    # Default fallback
-    return UI_MODE_AI_RESPONSE
-
-
-
 # Direct Mapping (for explicit lookups)
 
 INTENT_TO_UI_MODE: dict[str, str] = {
@@ -66,3 +34,28 @@ INTENT_TO_UI_MODE: dict[str, str] = {
     "general_joke": UI_MODE_AI_RESPONSE,
     "general_quirky": UI_MODE_AI_RESPONSE,
 }
+
+# Catch drift between the mapping and the intent categories at startup
+assert INTENT_TO_UI_MODE.keys() >= (
+    WEATHER_INTENTS | MUSIC_INTENTS | IOT_INTENTS | GENERAL_INTENTS
+), "INTENT_TO_UI_MODE is missing intents from the intent categories"
+
+
+
+# Intent to UI Mode Mapping
+
+def get_ui_mode(intent: str | None) -> str:
+    """
+    Get the UI mode for a given intent.
+
+    Args:
+        intent: The classified intent string
+
+    Returns:
+        UI mode string for the frontend widget
+    """
+    if intent is None:
+        return UI_MODE_AI_RESPONSE
+
+    # Unknown intents fall back to the AI response widget
+    return INTENT_TO_UI_MODE.get(intent, UI_MODE_AI_RESPONSE)
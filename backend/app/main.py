@@ -1,15 +1,18 @@
+import asyncio
 from contextlib import asynccontextmanager
 from typing import Any
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel
 import httpx
 
 from .config import get_settings
 from .models import AssistantResponse
-from .controller import get_controller
+from .controller import close_controllers, get_controller
 from .classifier_client import get_classifier_client
+from .http_client import close_http_client, get_http_client
 from .state_store import get_context_manager
 
 
@@ -31,14 +34,37 @@ class TokenResponse(BaseModel):
 
 # Lifespan Events
 
+async def warmup(app: FastAPI) -> None:
+    """Move first-request setup (Modal cold start, DNS, TLS) to startup."""
+    tasks = [get_classifier_client().warmup()]
+    # Open pooled connections to the hosts the token and TTS endpoints call
+    if settings.assemblyai_api_key:
+        tasks.append(app.state.http.head("https://streaming.assemblyai.com"))
+    if settings.rime_api_key:
+        tasks.append(app.state.http.head("https://users.rime.ai"))
+    # Failures here only mean the first real request pays the setup cost
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
     print("Starting up...")
+    # Shared outbound client so API calls reuse pooled TLS connections
+    app.state.http = get_http_client()
+    # Batch concurrent classifier calls
+    classifier = get_classifier_client()
+    classifier.start_batching()
+    # Warm up in the background so a cold Modal container doesn't hold up startup
+    app.state.warmup = asyncio.create_task(warmup(app))
     yield
     # Shutdown
     print("Shutting down...")
+    app.state.warmup.cancel()
+    await close_http_client()
+    # Close LLM clients
+    await close_controllers()
     # Close classifier client
     classifier = get_classifier_client()
     await classifier.close()
@@ -101,18 +127,18 @@ async def get_assemblyai_token() -> TokenResponse:
         )
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://streaming.assemblyai.com/v3/token",
-                headers={"authorization": api_key},
-                params={
-                    "expires_in_seconds": 600, # 10 minutes
-                    "max_session_duration_seconds": 1800 # 30 minutes
-                },
-            )
-            response.raise_for_status()
-            data = response.json()
-            return TokenResponse(token=data["token"])
+        response = await app.state.http.get(
+            "https://streaming.assemblyai.com/v3/token",
+            headers={"authorization": api_key},
+            params={
+                "expires_in_seconds": 600, # 10 minutes
+                "max_session_duration_seconds": 1800 # 30 minutes
+            },
+            timeout=30.0,
+        )
+        response.raise_for_status()
+        data = response.json()
+        return TokenResponse(token=data["token"])
 
     except httpx.HTTPStatusError as e:
         raise HTTPException(
@@ -127,8 +153,19 @@ async def get_assemblyai_token() -> TokenResponse:
 
 # NLU Processing Endpoint
 
-@app.post("/api/nlu/process")
-async def process_nlu(body: NLURequest) -> dict[str, Any]:
+# Prebuilt reply for blank input, serialized once at import
+EMPTY_TEXT_RESPONSE = Response(
+    content=AssistantResponse(
+        response="No text provided.",
+        ui_mode="ai_response",
+        state="error",
+        confidence=0.0,
+    ).model_dump_json(),
+    media_type="application/json",
+)
+
+@app.post("/api/nlu/process", response_model=AssistantResponse)
+async def process_nlu(body: NLURequest) -> Response:
     """
     Process user text input through the NLU pipeline.
 
@@ -144,25 +181,23 @@ async def process_nlu(body: NLURequest) -> dict[str, Any]:
     Returns:
         AssistantResponse with ui_mode, ui_data, response, and state
     """
-    if not body.text.strip():
-        return {
-            "intent": None,
-            "slots": {},
-            "response": "No text provided.",
-            "ui_mode": "ai_response",
-            "state": "error",
-            "confidence": 0.0,
-        }
+    if not body.text or body.text.isspace():
+        return EMPTY_TEXT_RESPONSE
 
-    controller = get_controller()
+    controller = get_controller(body.user_id)
     response = await controller.process_input(body.user_id, body.text)
-
-    # Convert to dict for JSON response
-    return response.model_dump()
+    # Serialized once by pydantic-core; returning a Response skips FastAPI's
+    # re-validation (response_model above still documents the schema)
+    return Response(content=response.model_dump_json(), media_type="application/json")
 
 
 # TTS Streaming Endpoint
 
+# 40 ms of 16 kHz 16-bit mono PCM (four 320-byte 10 ms frames): small enough
+# that rebuffering adds little to time-to-first-audio
+TTS_CHUNK_BYTES = 1280
+
+
 class TTSRequest(BaseModel):
     """Request body for TTS."""
 
@@ -189,36 +224,36 @@ async def stream_tts(body: TTSRequest):
     
     async def stream_audio():
         """Generator that streams audio chunks from Rime."""
-        async with httpx.AsyncClient() as client:
-            async with client.stream(
-                "POST",
-                "https://users.rime.ai/v1/rime-tts",
-                headers={
-                    "Accept": "audio/pcm",
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "speaker": body.speaker,
-                    "text": body.text,
-                    "modelId": "mistv2",
-                    "lang": "eng",
-                    "samplingRate": 16000,
-                    "speedAlpha": 1.0,
-                    "noTextNormalization": False,
-                },
-                timeout=30.0,
-            ) as response:
-                if response.status_code != 200:
-                    error_text = await response.aread()
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Rime API error: {error_text.decode()}"
-                    )
-                
-                # Stream chunks as they arrive
-                async for chunk in response.aiter_bytes():
-                    yield chunk
+        async with app.state.http.stream(
+            "POST",
+            "https://users.rime.ai/v1/rime-tts",
+            headers={
+                "Accept": "audio/pcm",
+                "Accept-Encoding": "identity",  # PCM does not compress, skip decoding
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "speaker": body.speaker,
+                "text": body.text,
+                "modelId": "mistv2",
+                "lang": "eng",
+                "samplingRate": 16000,
+                "speedAlpha": 1.0,
+                "noTextNormalization": False,
+            },
+            timeout=30.0,
+        ) as response:
+            if response.status_code != 200:
+                error_text = await response.aread()
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Rime API error: {error_text.decode()}"
+                )
+            
+            # Forward undecoded bytes in 40 ms chunks of whole 10 ms frames
+            async for chunk in response.aiter_raw(chunk_size=TTS_CHUNK_BYTES):
+                yield chunk
     
     return StreamingResponse(
         stream_audio(),
@@ -1,6 +1,6 @@
-from typing import Any, Literal, Optional
-from pydantic import BaseModel, Field
-from datetime import datetime
+from typing import Annotated, Any, Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field
+import time
 
 
 # Action Types - JSON-like structure for different intents
@@ -51,8 +51,16 @@ class GeneralAction(BaseModel):
     message: Optional[str] = None
 
 
-# Union type for all actions
-ActionData = WeatherAction | MusicAction | IoTAction | GeneralAction
+# Union type for all actions, tagged by `type` so validation picks the
+# matching model directly instead of trying each one
+ActionData = Annotated[
+    WeatherAction | MusicAction | IoTAction | GeneralAction,
+    Field(discriminator="type"),
+]
+
+
+# Frontend widget selected for a response
+UIMode = Literal["weather", "music", "smart_home", "ai_response"]
 
 
 # Conversation Turn
@@ -60,9 +68,11 @@ ActionData = WeatherAction | MusicAction | IoTAction | GeneralAction
 class Turn(BaseModel):
     """A single turn in the conversation history."""
 
+    model_config = ConfigDict(frozen=True)
+
     role: Literal["user", "assistant"]
     text: str
-    timestamp: datetime = Field(default_factory=datetime.now)
+    timestamp: float = Field(default_factory=time.time)  # Unix epoch seconds
     intent: Optional[str] = None
     slots: Optional[dict[str, Any]] = None
 
@@ -72,6 +82,9 @@ class Turn(BaseModel):
 class ClassificationResult(BaseModel):
     """Normalized classification result from Modal classifier."""
 
+    # Shared between turns by the classification cache, so never mutated
+    model_config = ConfigDict(frozen=True)
+
     intent: Optional[str] = None
     confidence: float = 0.0
     slots: dict[str, Any] = Field(default_factory=dict)
@@ -94,7 +107,7 @@ class AssistantResponse(BaseModel):
     """Response sent to frontend via WebSocket."""
 
     response: str
-    ui_mode: str = "ai_response"  # weather, music, smart_home, ai_response
+    ui_mode: UIMode = "ai_response"
     ui_data: Optional[dict[str, Any]] = None
     action: Optional[ActionData] = None
     state: Literal["awaiting_info", "processing", "completed", "error"] = "completed"
@@ -1,4 +1,10 @@
-"""Services package - exports all service classes."""
+"""Services package - exports all service classes.
+
+The services are I/O-bound (HTTP APIs, ytmusicapi) and otherwise shuffle
+strings and dicts, so JIT compilers like Numba don't apply here: nopython
+mode doesn't support these types and object mode is slower than plain
+CPython. Speedups come from connection reuse, lookup tables and caching.
+"""
 
 from app.services.weather_service import WeatherService
 from app.services.music_service import MusicService
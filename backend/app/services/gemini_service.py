@@ -1,9 +1,72 @@
-from typing import Optional, List
+import contextlib
+from functools import lru_cache
+from typing import Optional, Sequence
 from app.config import get_settings
+from app.models import Turn
 from google import genai
 from google.genai import types
 
 
+# Follow-up suggestions (shared, never mutated)
+_WEATHER_SUG = (
+    "What about tomorrow?",
+    "How about next week?",
+    "Should I bring an umbrella?",
+    "What's the UV index?",
+)
+_MUSIC_SUG = (
+    "Skip this song",
+    "Turn up the volume",
+    "Play something chill",
+    "Add to favorites",
+)
+_IOT_SUG = (
+    "Dim the lights",
+    "Turn off all lights",
+    "Set lights to blue",
+    "Activate movie mode",
+)
+_DEFAULT_SUG = (
+    "What's the weather like?",
+    "Turn on the lights",
+    "Play some music",
+    "Tell me a joke",
+)
+
+# Everything but the text of a response given while Gemini is unavailable
+_MOCK_BASE = {
+    "suggestions": (
+        "What's the weather forecast?",
+        "Turn on the lights",
+        "Play some music",
+        "Tell me more about AI",
+    ),
+    "_mock": True,
+}
+
+# Conversation turn role -> Gemini content role
+_GEMINI_ROLES = {"user": "user", "assistant": "model"}
+
+_CATEGORY_SUGGESTIONS: dict[str, tuple[str, ...]] = {
+    "weather": _WEATHER_SUG,
+    "music": _MUSIC_SUG,
+    "iot": _IOT_SUG,
+}
+
+
+@lru_cache(maxsize=256)
+def _intent_category(intent: str) -> Optional[str]:
+    """Map an intent to its weather/music/iot category (memoized per intent)."""
+    intent_lower = intent.lower()
+    if "weather" in intent_lower:
+        return "weather"
+    if "music" in intent_lower:
+        return "music"
+    if "iot" in intent_lower or "light" in intent_lower:
+        return "iot"
+    return None
+
+
 class GeminiService:
     """Service for generating AI responses using Google Gemini."""
 
@@ -34,12 +97,28 @@ You help users with:
     def __init__(self):
         self.settings = get_settings()
         self._client = None
+        # Key is fixed for the process, so validate it once
+        key = self.settings.gemini_api_key
+        self._gemini_enabled = bool(key) and "your_gemini_api_key" not in key
+
+        # Request configs never change, so build them once
+        self._chat_config = types.GenerateContentConfig(
+            system_instruction=self.SYSTEM_PROMPT,
+            temperature=0.9,  # More creative for personality
+            # max_output_tokens=150,  # Limit for faster response
+            candidate_count=1,
+        )
+        self._contextual_config = types.GenerateContentConfig(
+            system_instruction=self.SYSTEM_PROMPT,
+            temperature=0.9,
+            max_output_tokens=100,
+        )
 
     @property
     def client(self):
         """Lazy initialization of Gemini client."""
         if self._client is None:
-            if not self.settings.gemini_api_key or "your_gemini_api_key" in self.settings.gemini_api_key:
+            if not self._gemini_enabled:
                 raise ValueError("Gemini API key not configured")
             self._client = genai.Client(api_key=self.settings.gemini_api_key)
         return self._client
@@ -47,7 +126,7 @@ You help users with:
     async def generate_response(
         self,
         user_message: str,
-        context: Optional[List[dict]] = None,
+        context: Optional[Sequence[Turn]] = None,
         intent: Optional[str] = None,
     ) -> dict:
         """
@@ -61,28 +140,23 @@ You help users with:
         Returns:
             Response data formatted for the frontend AIResponseWidget
         """
-        if not self.settings.gemini_api_key or "your_gemini_api_key" in self.settings.gemini_api_key:
+        if not self._gemini_enabled:
             return self._get_mock_response(user_message)
 
         try:
-            # Build conversation history
-            chat_history = []
-            if context:
-                for turn in context[-5:]:  # Last 5 turns max
-                    if turn.role == "user":
-                        chat_history.append(
-                            types.Content(
-                                role="user",
-                                parts=[types.Part.from_text(text=turn.text)]
-                            )
-                        )
-                    if turn.role == "assistant":
-                        chat_history.append(
-                            types.Content(
-                                role="model",
-                                parts=[types.Part.from_text(text=turn.text)]
-                            )
-                        )
+            # Local aliases for the per-turn content builders
+            Content = types.Content
+            part_from_text = types.Part.from_text
+
+            # Build conversation history (last 5 turns max)
+            chat_history = [
+                Content(
+                    role=_GEMINI_ROLES[turn.role],
+                    parts=[part_from_text(text=turn.text)]
+                )
+                for turn in (context or ())[-5:]
+                if turn.role in _GEMINI_ROLES
+            ]
 
             # Add context about what the user is trying to do
             enhanced_message = user_message
@@ -90,31 +164,26 @@ You help users with:
                 enhanced_message = f"[User intent: {intent}] {user_message}"
 
             # Use streaming for low latency - collect first chunk quickly
-            response_text = ""
+            chunks = []
             async for chunk in await self.client.aio.models.generate_content_stream(
                 model="gemini-3-flash-preview",  # Fast model for low latency
                 contents=[
                     *chat_history,
-                    types.Content(
+                    Content(
                         role="user",
-                        parts=[types.Part.from_text(text=enhanced_message)]
+                        parts=[part_from_text(text=enhanced_message)]
                     )
                 ],
-                config=types.GenerateContentConfig(
-                    system_instruction=self.SYSTEM_PROMPT,
-                    temperature=0.9,  # More creative for personality
-                    # max_output_tokens=150,  # Limit for faster response
-                    candidate_count=1,
-                ),
+                config=self._chat_config,
             ):
                 if chunk.text:
-                    response_text += chunk.text
+                    chunks.append(chunk.text)
 
             # Generate follow-up suggestions
             suggestions = self._generate_suggestions(intent, user_message)
 
             return {
-                "response": response_text.strip(),
+                "response": "".join(chunks).strip(),
                 "suggestions": suggestions,
             }
 
@@ -124,40 +193,11 @@ You help users with:
 
     def _generate_suggestions(
         self, intent: Optional[str], user_message: str
-    ) -> List[str]:
+    ) -> Sequence[str]:
         """Generate contextual follow-up suggestions."""
-        default_suggestions = [
-            "What's the weather like?",
-            "Turn on the lights",
-            "Play some music",
-            "Tell me a joke",
-        ]
-
-        if intent:
-            intent_lower = intent.lower()
-            if "weather" in intent_lower:
-                return [
-                    "What about tomorrow?",
-                    "How about next week?",
-                    "Should I bring an umbrella?",
-                    "What's the UV index?",
-                ]
-            elif "music" in intent_lower:
-                return [
-                    "Skip this song",
-                    "Turn up the volume",
-                    "Play something chill",
-                    "Add to favorites",
-                ]
-            elif "iot" in intent_lower or "light" in intent_lower:
-                return [
-                    "Dim the lights",
-                    "Turn off all lights",
-                    "Set lights to blue",
-                    "Activate movie mode",
-                ]
-
-        return default_suggestions
+        if not intent:
+            return _DEFAULT_SUG
+        return _CATEGORY_SUGGESTIONS.get(_intent_category(intent), _DEFAULT_SUG)
 
     def _get_mock_response(self, user_message: str) -> dict:
         """Return a mock response when Gemini is unavailable."""
@@ -175,16 +215,7 @@ You help users with:
         else:
             response = "I'm here to help! Ask me about the weather, music, or controlling your smart home devices."
 
-        return {
-            "response": response,
-            "suggestions": [
-                "What's the weather forecast?",
-                "Turn on the lights",
-                "Play some music",
-                "Tell me more about AI",
-            ],
-            "_mock": True,
-        }
+        return {"response": response, **_MOCK_BASE}
 
     async def generate_contextual_response(
         self,
@@ -203,7 +234,7 @@ You help users with:
         Returns:
             A contextual response string
         """
-        if not self.settings.gemini_api_key or "your_gemini_api_key" in self.settings.gemini_api_key:
+        if not self._gemini_enabled:
             return self._generate_simple_response(intent, action_result)
 
         try:
@@ -217,23 +248,19 @@ Generate a SHORT, conversational response (1-2 sentences) that:
 3. Is suitable for text-to-speech (no emojis/formatting)"""
 
             # Use streaming for faster first response
-            response_text = ""
+            chunks = []
             async for chunk in await self.client.aio.models.generate_content_stream(
                 model="gemini-2.5-flash",
                 contents=types.Content(
                     role="user",
                     parts=[types.Part.from_text(text=prompt)]
                 ),
-                config=types.GenerateContentConfig(
-                    system_instruction=self.SYSTEM_PROMPT,
-                    temperature=0.9,
-                    max_output_tokens=100,
-                ),
+                config=self._contextual_config,
             ):
                 if chunk.text:
-                    response_text += chunk.text
+                    chunks.append(chunk.text)
 
-            return response_text.strip()
+            return "".join(chunks).strip()
 
         except Exception as e:
             print(f"[GeminiService] Error generating contextual response: {e}")
@@ -241,28 +268,28 @@ Generate a SHORT, conversational response (1-2 sentences) that:
 
     def _generate_simple_response(self, intent: str, action_result: dict) -> str:
         """Generate a simple response without Gemini."""
-        intent_lower = intent.lower()
+        category = _intent_category(intent)
 
-        if "weather" in intent_lower:
+        if category == "weather":
             temp = action_result.get("temperature", "??")
             condition = action_result.get("condition", "unknown")
             location = action_result.get("location", "your area")
             return f"It's currently {temp}°F and {condition.lower()} in {location}."
 
-        elif "music" in intent_lower:
+        elif category == "music":
             title = action_result.get("title", "something")
             artist = action_result.get("artist", "an artist")
             return f"Now playing '{title}' by {artist}. Enjoy!"
 
-        elif "iot" in intent_lower or "light" in intent_lower:
+        elif category == "iot":
             return "Done! Your smart home awaits your next command."
 
         return "Got it! Is there anything else I can help with?"
 
-    def __del__(self):
-        """Cleanup client connection."""
+    async def aclose(self) -> None:
+        """Close the Gemini client connections (called on app shutdown)."""
         if self._client is not None:
-            try:
-                self._client.close()
-            except:
-                pass
\ No newline at end of file
+            client, self._client = self._client, None
+            with contextlib.suppress(Exception):
+                await client.aio.aclose()
+                client.close()
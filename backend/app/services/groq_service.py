@@ -1,13 +1,25 @@
-import json
-from typing import Any, Optional, List
+import re
+from functools import lru_cache
+from typing import Any, Optional, List, Sequence
+import orjson
 from groq import Groq
 from app.config import get_settings
+from app.models import Turn
 
 
-class GroqService:
-    """Service for generating AI responses using Groq with tool calling."""
+# Qwen wraps its reasoning in <think>...</think> before the answer
+_THINK_RE = re.compile(r"<think>.*?</think>", re.DOTALL)
 
-    SYSTEM_PROMPT = """You are VCNI (Voice Controlled Natural Interface), a sassy, witty, and helpful smart home assistant. 
+# Widget shown for each tool's results
+_TOOL_UI_MODE = {
+    "get_weather": "weather",
+    "play_music": "music",
+    "control_device": "smart_home",
+    "web_search": "ai_response",
+}
+
+# System prompt for every chat request (also exposed as GroqService.SYSTEM_PROMPT)
+_SYSTEM_PROMPT = """You are VCNI (Voice Controlled Natural Interface), a sassy, witty, and helpful smart home assistant. 
 
 Your personality traits:
 - Confident and moderately sarcastic, but always helpful
@@ -34,6 +46,90 @@ You help users with:
 - General questions and conversation
 """
 
+# Shared first message for every chat request (the Groq SDK does not mutate it)
+_SYSTEM_MSG = {"role": "system", "content": _SYSTEM_PROMPT}
+
+# Follow-up suggestions (shared, never mutated)
+_WEATHER_SUG = (
+    "What about tomorrow?",
+    "How about next week?",
+    "Should I bring an umbrella?",
+)
+_MUSIC_SUG = (
+    "Skip this song",
+    "Turn up the volume",
+    "Play something chill",
+)
+_IOT_SUG = (
+    "Dim the lights",
+    "Turn off all lights",
+    "Set lights to blue",
+)
+_SEARCH_SUG = (
+    "Tell me more",
+    "Search for something else",
+    "What's trending?",
+)
+_DEFAULT_SUG = (
+    "What's the weather like?",
+    "Turn on the lights",
+    "Play some music",
+    "Search for latest news",
+)
+
+# Everything but the text of a response given while Groq is unavailable
+_FALLBACK_BASE = {
+    "suggestions": (
+        "What's the weather?",
+        "Turn on the lights",
+        "Play some music",
+    ),
+    "_fallback": True,
+}
+
+_CATEGORY_SUGGESTIONS: dict[str, tuple[str, ...]] = {
+    "weather": _WEATHER_SUG,
+    "music": _MUSIC_SUG,
+    "iot": _IOT_SUG,
+    "search": _SEARCH_SUG,
+}
+
+
+def _history_messages(context: Sequence[Turn]) -> List[dict]:
+    """Convert the last 5 conversation turns to chat messages."""
+    return [
+        {"role": turn.role, "content": turn.text}  # Turn roles match Groq's
+        for turn in context[-5:]
+    ]
+
+
+def _parse_tool_args(arguments: str) -> dict:
+    """Parse a tool call's JSON arguments."""
+    # Parsed fresh each call: args can hold lists (device_names) and end up in
+    # tool_results, so a shared cached value would leak mutations between calls
+    return orjson.loads(arguments)
+
+
+@lru_cache(maxsize=256)
+def _intent_category(intent: str) -> Optional[str]:
+    """Map an intent to its suggestion category (memoized per intent)."""
+    intent_lower = intent.lower()
+    if "weather" in intent_lower:
+        return "weather"
+    if "music" in intent_lower:
+        return "music"
+    if "iot" in intent_lower or "light" in intent_lower:
+        return "iot"
+    if "search" in intent_lower:
+        return "search"
+    return None
+
+
+class GroqService:
+    """Service for generating AI responses using Groq with tool calling."""
+
+    SYSTEM_PROMPT = _SYSTEM_PROMPT
+
     # Tool definitions for all services
     TOOLS = [
         {
@@ -94,6 +190,11 @@ You help users with:
                             "type": "string",
                             "description": "Name of the device (e.g., 'living room lights', 'bedroom lamp')"
                         },
+                        "device_names": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Names of several devices to control together (instead of device_name)"
+                        },
                         "room": {
                             "type": "string",
                             "description": "Room where the device is located"
@@ -133,20 +234,27 @@ You help users with:
     def __init__(self):
         self.settings = get_settings()
         self._client = None
+        self._groq_enabled = bool(self.settings.groq_api_key)
 
     @property
     def client(self) -> Groq:
         """Lazy initialization of Groq client."""
         if self._client is None:
-            if not self.settings.groq_api_key:
+            if not self._groq_enabled:
                 raise ValueError("Groq API key not configured")
             self._client = Groq(api_key=self.settings.groq_api_key)
         return self._client
 
+    async def aclose(self) -> None:
+        """Close the Groq client connections (called on app shutdown)."""
+        if self._client is not None:
+            client, self._client = self._client, None
+            client.close()
+
     async def generate_response(
         self,
         user_message: str,
-        context: Optional[List[dict]] = None,
+        context: Optional[Sequence[Turn]] = None,
         intent: Optional[str] = None,
     ) -> dict:
         """
@@ -160,20 +268,15 @@ You help users with:
         Returns:
             Response data formatted for the frontend AIResponseWidget
         """
-        if not self.settings.groq_api_key:
+        if not self._groq_enabled:
             return self._get_fallback_response(user_message)
 
         try:
-            messages = [{"role": "system", "content": self.SYSTEM_PROMPT}]
+            messages = [_SYSTEM_MSG]
             
-            # Add context if available
+            # Add context (last 5 turns)
             if context:
-                for turn in context[-5:]:  # Last 5 turns
-                    if hasattr(turn, 'role') and hasattr(turn, 'text'):
-                        messages.append({
-                            "role": "user" if turn.role == "user" else "assistant",
-                            "content": turn.text
-                        })
+                messages.extend(_history_messages(context))
             
             # Add current message with intent context
             current_msg = user_message
@@ -207,7 +310,7 @@ You help users with:
         self,
         user_message: str,
         tool_executor: Any,
-        context: Optional[List[dict]] = None,
+        context: Optional[Sequence[Turn]] = None,
     ) -> dict:
         """
         Generate a response using tool calling loop.
@@ -220,23 +323,21 @@ You help users with:
         Returns:
             Response data with tool results integrated
         """
-        if not self.settings.groq_api_key:
+        if not self._groq_enabled:
             return self._get_fallback_response(user_message)
 
         try:
-            messages = [{"role": "system", "content": self.SYSTEM_PROMPT}]
+            messages = [_SYSTEM_MSG]
             
-            # Add context
+            # Add context (last 5 turns)
             if context:
-                for turn in context[-5:]:
-                    if hasattr(turn, 'role') and hasattr(turn, 'text'):
-                        messages.append({
-                            "role": "user" if turn.role == "user" else "assistant",
-                            "content": turn.text
-                        })
+                messages.extend(_history_messages(context))
             
             messages.append({"role": "user", "content": user_message})
 
+            # Resolve the client once rather than on every iteration
+            create_completion = self.client.chat.completions.create
+
             # Tool calling loop
             max_iterations = 5
             tool_results = []
@@ -246,7 +347,7 @@ You help users with:
             for iteration in range(max_iterations):
                 # print(f"[GroqService] Tool calling iteration {iteration + 1}")
                 
-                response = self.client.chat.completions.create(
+                response = create_completion(
                     model="qwen/qwen3-32b",
                     messages=messages,
                     tools=self.TOOLS,
@@ -274,15 +375,21 @@ You help users with:
                 # Add assistant message with tool calls
                 messages.append(response_message)
 
-                # Execute each tool call
-                for tool_call in tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    # print(f"[GroqService] Executing tool: {function_name}({function_args})")
-                    
-                    # Execute the tool
-                    result = await tool_executor.execute(function_name, function_args)
+                # Execute the tool calls concurrently (they hit unrelated services)
+                calls = [
+                    (tool_call, tool_call.function.name, _parse_tool_args(tool_call.function.arguments))
+                    for tool_call in tool_calls
+                ]
+                # print(f"[GroqService] Executing tools: {[(name, args) for _, name, args in calls]}")
+                results = await tool_executor.execute_many(
+                    [(name, args) for _, name, args in calls]
+                )
+
+                # Record results in call order
+                for (tool_call, function_name, function_args), result in zip(calls, results):
+                    tool_ui_data = result.ui_data
+                    response_data = result.response_data
+
                     tool_results.append({
                         "tool": function_name,
                         "args": function_args,
@@ -290,27 +397,22 @@ You help users with:
                     })
                     
                     # Update UI mode based on tool used
-                    if function_name == "get_weather":
-                        ui_mode = "weather"
-                        ui_data = result.get("ui_data")
-                    elif function_name == "play_music":
-                        ui_mode = "music"
-                        ui_data = result.get("ui_data")
-                    elif function_name == "control_device":
-                        ui_mode = "smart_home"
-                        ui_data = result.get("ui_data")
-                    elif function_name == "web_search":
-                        ui_mode = "ai_response"
-                        # Merge search results into response
-                        if result.get("ui_data"):
-                            ui_data = result.get("ui_data")
+                    tool_ui_mode = _TOOL_UI_MODE.get(function_name)
+                    if tool_ui_mode is not None:
+                        ui_mode = tool_ui_mode
+                        # Search results only replace earlier UI data when they have some
+                        if tool_ui_data or function_name != "web_search":
+                            ui_data = tool_ui_data
 
                     # Add tool result to messages
                     messages.append({
                         "role": "tool",
                         "tool_call_id": tool_call.id,
                         "name": function_name,
-                        "content": json.dumps(result.get("response_data", result))
+                        "content": orjson.dumps(
+                            response_data,
+                            option=orjson.OPT_NON_STR_KEYS,
+                        ).decode(),
                     })
 
             # Max iterations reached
@@ -328,50 +430,18 @@ You help users with:
 
     def _clean_response(self, text: str) -> str:
         """Remove thinking tags and clean up response."""
-        import re
-        # Remove <think>...</think> tags (Qwen uses these for reasoning)
-        text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
+        # Skip the regex when Qwen emitted no reasoning
+        if "<think>" in text:
+            text = _THINK_RE.sub("", text)
         return text.strip()
 
     def _generate_suggestions(
         self, intent: Optional[str], user_message: str
-    ) -> List[str]:
+    ) -> Sequence[str]:
         """Generate contextual follow-up suggestions."""
-        default_suggestions = [
-            "What's the weather like?",
-            "Turn on the lights",
-            "Play some music",
-            "Search for latest news",
-        ]
-
-        if intent:
-            intent_lower = intent.lower()
-            if "weather" in intent_lower:
-                return [
-                    "What about tomorrow?",
-                    "How about next week?",
-                    "Should I bring an umbrella?",
-                ]
-            elif "music" in intent_lower:
-                return [
-                    "Skip this song",
-                    "Turn up the volume",
-                    "Play something chill",
-                ]
-            elif "iot" in intent_lower or "light" in intent_lower:
-                return [
-                    "Dim the lights",
-                    "Turn off all lights",
-                    "Set lights to blue",
-                ]
-            elif "search" in intent_lower:
-                return [
-                    "Tell me more",
-                    "Search for something else",
-                    "What's trending?",
-                ]
-
-        return default_suggestions
+        if not intent:
+            return _DEFAULT_SUG
+        return _CATEGORY_SUGGESTIONS.get(_intent_category(intent), _DEFAULT_SUG)
 
     def _get_fallback_response(self, user_message: str) -> dict:
         """Return a fallback response when Groq is unavailable."""
@@ -384,12 +454,4 @@ You help users with:
         else:
             response = "I'm having trouble connecting to my brain right now. Try again in a moment?"
 
-        return {
-            "response": response,
-            "suggestions": [
-                "What's the weather?",
-                "Turn on the lights",
-                "Play some music",
-            ],
-            "_fallback": True,
-        }
+        return {"response": response, **_FALLBACK_BASE}
@@ -1,8 +1,14 @@
+from collections import OrderedDict
 from typing import Dict, List, Optional
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
 
 
+# Spoken confirmations for control_device results
+_SINGLE_DEVICE_RESPONSE = "I've turned the %s %s."
+_MULTI_DEVICE_RESPONSE = "I've turned %d devices %s."
+
+
 class DeviceType(str, Enum):
     LIGHT = "light"
     THERMOSTAT = "thermostat"
@@ -11,7 +17,7 @@ class DeviceType(str, Enum):
     SWITCH = "switch"
 
 
-@dataclass
+@dataclass(slots=True)
 class Device:
     """Represents a smart home device."""
     id: int
@@ -20,23 +26,41 @@ class Device:
     status: bool = False
     value: int = 0  # Brightness for lights, temperature for thermostat, etc.
     color: Optional[str] = None  # For RGB lights
+    # Last to_dict() output; cleared via invalidate() whenever state changes
+    _cached_dict: Optional[dict] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def to_dict(self) -> dict:
-        return {
-            "id": self.id,
-            "name": self.name,
-            "type": self.type.value,
-            "status": self.status,
-            "value": self.value,
-            "color": self.color,
-        }
+        if self._cached_dict is None:
+            self._cached_dict = {
+                "id": self.id,
+                "name": self.name,
+                "type": self.type.value,
+                "status": self.status,
+                "value": self.value,
+                "color": self.color,
+            }
+        return self._cached_dict
+
+    def invalidate(self) -> None:
+        """Drop the cached dict after mutating the device."""
+        self._cached_dict = None
 
 
 class IoTService:
     """Service for controlling smart home devices with persistent state."""
 
-    # In-memory device state per user
-    _user_devices: Dict[str, List[Device]] = {}
+    # In-memory device state per user, least recently used first
+    _user_devices: "OrderedDict[str, List[Device]]" = OrderedDict()
+    # Lowercased device names/types, parallel to _user_devices (for matching)
+    _user_names_lower: Dict[str, List[str]] = {}
+    _user_types_lower: Dict[str, List[str]] = {}
+    # Serialized device list per user, replaced (never mutated) on changes
+    _user_snapshots: Dict[str, List[dict]] = {}
+
+    # Users whose device state is kept before the least recent is dropped
+    MAX_USERS = 10_000
 
     # Default devices for new users
     DEFAULT_DEVICES = [
@@ -54,26 +78,44 @@ class IoTService:
 
     def _get_devices(self) -> List[Device]:
         """Get or initialize devices for the current user."""
-        if self.user_id not in IoTService._user_devices:
-            # Create a copy of default devices for this user
-            IoTService._user_devices[self.user_id] = [
-                Device(
-                    id=d.id,
-                    name=d.name,
-                    type=d.type,
-                    status=d.status,
-                    value=d.value,
-                    color=d.color,
-                )
-                for d in self.DEFAULT_DEVICES
-            ]
-        return IoTService._user_devices[self.user_id]
+        user_devices = IoTService._user_devices
+        devices = user_devices.get(self.user_id)
+        if devices is not None:
+            user_devices.move_to_end(self.user_id)
+            return devices
+
+        # Create a copy of default devices for this user
+        devices = user_devices[self.user_id] = [
+            replace(d) for d in self.DEFAULT_DEVICES
+        ]
+        # Names and types never change, so lowercase them once per user
+        IoTService._user_names_lower[self.user_id] = [d.name.lower() for d in devices]
+        IoTService._user_types_lower[self.user_id] = [d.type.value.lower() for d in devices]
+        self._refresh_snapshot(devices)
+
+        # Bound memory by forgetting the least recently active user
+        if len(user_devices) > self.MAX_USERS:
+            evicted, _ = user_devices.popitem(last=False)
+            del IoTService._user_names_lower[evicted]
+            del IoTService._user_types_lower[evicted]
+            del IoTService._user_snapshots[evicted]
+        return devices
+
+    def _device_snapshot(self) -> List[dict]:
+        """Get the current user's serialized devices (call after _get_devices)."""
+        return IoTService._user_snapshots[self.user_id]
+
+    def _refresh_snapshot(self, devices: List[Device]) -> None:
+        """Rebuild the user's snapshot after mutating their devices."""
+        # A new list, so responses still holding the old one stay consistent;
+        # unchanged devices reuse their cached dicts
+        IoTService._user_snapshots[self.user_id] = [d.to_dict() for d in devices]
 
     async def get_all_devices(self) -> dict:
         """Get all devices and their current states."""
         devices = self._get_devices()
         return {
-            "devices": [d.to_dict() for d in devices],
+            "devices": self._device_snapshot(),
         }
 
     async def control_device(
@@ -100,11 +142,57 @@ class IoTService:
         # Find matching device(s)
         matched_devices = self._find_devices(devices, device_name)
         
+        return self._apply_action(
+            devices, matched_devices, device_name, action, value, color
+        )
+
+    async def control_devices(
+        self,
+        device_names: List[str],
+        action: str = "toggle",
+        value: Optional[int] = None,
+        color: Optional[str] = None,
+    ) -> dict:
+        """
+        Control several smart home devices in one call.
+
+        Args:
+            device_names: Names or partial names of the devices
+            action: 'on', 'off', 'toggle', 'set'
+            value: Optional value to set (brightness, temperature)
+            color: Optional color for RGB lights
+
+        Returns:
+            Updated device states and all devices for widget sync
+        """
+        devices = self._get_devices()
+
+        # Union of each name's matches, each device once, in match order
+        matched_devices = list({
+            device.id: device
+            for name in device_names
+            for device in self._find_devices(devices, name)
+        }.values())
+
+        return self._apply_action(
+            devices, matched_devices, ", ".join(device_names), action, value, color
+        )
+
+    def _apply_action(
+        self,
+        devices: List[Device],
+        matched_devices: List[Device],
+        device_name: Optional[str],
+        action: str,
+        value: Optional[int],
+        color: Optional[str],
+    ) -> dict:
+        """Apply an action to matched devices and build the control result."""
         if not matched_devices:
             return {
                 "error": True,
                 "message": f"No device found matching '{device_name}'",
-                "devices": [d.to_dict() for d in devices],
+                "devices": self._device_snapshot(),
             }
 
         # Apply action to matched devices
@@ -125,6 +213,7 @@ class IoTService:
                 if color is not None:
                     device.color = color
                     device.status = True
+            device.invalidate()
 
             results.append({
                 "device": device.name,
@@ -135,10 +224,11 @@ class IoTService:
                 "color": device.color,
             })
 
+        self._refresh_snapshot(devices)
         return {
             "success": True,
             "results": results,
-            "devices": [d.to_dict() for d in devices],
+            "devices": self._device_snapshot(),
         }
 
     def _find_devices(
@@ -152,15 +242,17 @@ class IoTService:
         pattern = name_pattern.lower()
         matched = []
 
-        for device in devices:
-            device_name = device.name.lower()
-            device_type = device.type.value.lower()
-
+        plural = pattern + "s"  # "light" -> "lights"
+        for device, device_name, device_type in zip(
+            devices,
+            IoTService._user_names_lower[self.user_id],
+            IoTService._user_types_lower[self.user_id],
+        ):
             # Match by name or type
             if (
                 pattern in device_name
                 or pattern in device_type
-                or pattern + "s" in device_type  # "light" -> "lights"
+                or plural in device_type
                 or device_name in pattern
             ):
                 matched.append(device)
@@ -187,17 +279,19 @@ class IoTService:
             if device.type == DeviceType.THERMOSTAT:
                 device.value = temperature
                 device.status = True
+                device.invalidate()
+                self._refresh_snapshot(devices)
                 return {
                     "success": True,
                     "device": device.name,
                     "temperature": temperature,
-                    "devices": [d.to_dict() for d in devices],
+                    "devices": self._device_snapshot(),
                 }
 
         return {
             "error": True,
             "message": "No thermostat found",
-            "devices": [d.to_dict() for d in devices],
+            "devices": self._device_snapshot(),
         }
 
     def generate_response(self, result: dict, action: str, device_name: str) -> str:
@@ -209,12 +303,8 @@ class IoTService:
         if not results:
             return "Done! I've updated your smart home."
 
+        first = results[0]
+        status = "on" if first.get("new_status") else "off"
         if len(results) == 1:
-            r = results[0]
-            device = r.get("device", "device")
-            status = "on" if r.get("new_status") else "off"
-            return f"I've turned the {device} {status}."
-        else:
-            count = len(results)
-            status = "on" if results[0].get("new_status") else "off"
-            return f"I've turned {count} devices {status}."
+            return _SINGLE_DEVICE_RESPONSE % (first.get("device", "device"), status)
+        return _MULTI_DEVICE_RESPONSE % (len(results), status)
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional, List
 from ytmusicapi import YTMusic
 
@@ -45,7 +46,10 @@ class MusicService:
         # print(f"[MusicService] Searching for '{query}' with filter '{yt_filter}'")
 
         # Search YouTube Music - let exceptions propagate
-        results = self._ytmusic.search(query, filter=yt_filter, limit=5)
+        # (ytmusicapi does blocking HTTP, so keep it off the event loop)
+        results = await asyncio.to_thread(
+            self._ytmusic.search, query, filter=yt_filter, limit=5
+        )
 
         # Assert we got results
         if not results:
@@ -126,21 +130,22 @@ class MusicService:
         """Parse duration string (e.g., '3:45') to seconds."""
         if not duration_str:
             return 0
-        try:
-            parts = duration_str.split(":")
-            if len(parts) == 2:
-                return int(parts[0]) * 60 + int(parts[1])
-            elif len(parts) == 3:
-                return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-            return 0
-        except ValueError:
+        parts = duration_str.split(":")
+        # Validate up front instead of catching ValueError from int()
+        if not all(part.isdecimal() for part in parts):
             return 0
+        total = 0
+        for part in parts:
+            total = total * 60 + int(part)
+        return total
 
     async def get_watch_playlist(self, video_id: str) -> List[dict]:
         """Get the 'watch next' playlist for a video."""
         assert video_id, "video_id cannot be empty"
         
-        watch_playlist = self._ytmusic.get_watch_playlist(video_id, limit=10)
+        watch_playlist = await asyncio.to_thread(
+            self._ytmusic.get_watch_playlist, video_id, limit=10
+        )
         tracks = watch_playlist.get("tracks", [])
 
         return [
@@ -1,6 +1,8 @@
 import httpx
+import orjson
 from typing import Optional, List
 from app.config import get_settings
+from app.http_client import get_http_client
 
 
 class SearchService:
@@ -33,50 +35,50 @@ class SearchService:
             return self._get_mock_results(query)
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/search",
-                    json={
-                        "api_key": self.settings.tavily_api_key,
-                        "query": query,
-                        "max_results": min(max_results, 10),
-                        "search_depth": search_depth,
-                        "include_answer": include_answer,
-                        "include_raw_content": False,
-                    },
-                    timeout=15.0,
-                )
-                response.raise_for_status()
-                data = response.json()
+            response = await get_http_client().post(
+                f"{self.base_url}/search",
+                content=orjson.dumps({
+                    "api_key": self.settings.tavily_api_key,
+                    "query": query,
+                    "max_results": min(max_results, 10),
+                    "search_depth": search_depth,
+                    "include_answer": include_answer,
+                    "include_raw_content": False,
+                }),
+                headers={"Content-Type": "application/json"},
+                timeout=15.0,
+            )
+            response.raise_for_status()
+            data = orjson.loads(response.content)
 
-                # Format results for LLM consumption
-                results = []
-                for r in data.get("results", []):
-                    results.append({
-                        "title": r.get("title", ""),
-                        "url": r.get("url", ""),
-                        "snippet": r.get("content", "")[:300],  # Truncate for LLM
-                        "score": r.get("score", 0),
-                    })
+            # Format results for LLM consumption
+            results = []
+            for r in data.get("results", []):
+                results.append({
+                    "title": r.get("title", ""),
+                    "url": r.get("url", ""),
+                    "snippet": r.get("content", "")[:300],  # Truncate for LLM
+                    "score": r.get("score", 0),
+                })
 
-                answer = data.get("answer", "")
-                
-                # Build response for both LLM and UI
-                return {
-                    "success": True,
-                    "response_data": {
-                        "answer": answer,
-                        "results": results,
-                        "query": query,
-                    },
-                    "ui_data": {
-                        "searchQuery": query,
-                        "answer": answer,
-                        "results": results[:5],  # Top 5 for UI
-                        "resultCount": len(results),
-                    },
-                    "response_text": self._format_response_text(answer, results),
-                }
+            answer = data.get("answer", "")
+            
+            # Build response for both LLM and UI
+            return {
+                "success": True,
+                "response_data": {
+                    "answer": answer,
+                    "results": results,
+                    "query": query,
+                },
+                "ui_data": {
+                    "searchQuery": query,
+                    "answer": answer,
+                    "results": results[:5],  # Top 5 for UI
+                    "resultCount": len(results),
+                },
+                "response_text": self._format_response_text(answer, results),
+            }
 
         except httpx.HTTPStatusError as e:
             print(f"[SearchService] HTTP error: {e.response.status_code}")
@@ -92,10 +94,9 @@ class SearchService:
         
         if results:
             # Summarize top results
-            summaries = []
-            for r in results[:3]:
-                summaries.append(f"{r['title']}: {r['snippet'][:100]}")
-            return "Here's what I found: " + " ".join(summaries)
+            return "Here's what I found: " + " ".join([
+                f"{r['title']}: {r['snippet'][:100]}" for r in results[:3]
+            ])
         
         return "I couldn't find any relevant results for that search."
 
@@ -1,6 +1,27 @@
 import httpx
+from datetime import date
 from typing import Optional
 from app.config import get_settings
+from app.http_client import get_http_client
+
+
+# WeatherAPI condition code -> frontend icon type
+_ICON_BY_CODE: dict[int, str] = {
+    # Sunny/Clear
+    1000: "sun",
+    # Cloudy conditions
+    **dict.fromkeys((1003, 1006, 1009), "cloud"),
+    # Rainy/Drizzle conditions
+    **dict.fromkeys(
+        (1063, 1180, 1183, 1186, 1189, 1192, 1195, 1240, 1243, 1246), "rain"
+    ),
+    # Snow conditions
+    **dict.fromkeys(
+        (1066, 1114, 1210, 1213, 1216, 1219, 1222, 1225, 1255, 1258), "snow"
+    ),
+    # Thunderstorm
+    **dict.fromkeys((1087, 1273, 1276, 1279, 1282), "storm"),
+}
 
 
 class WeatherService:
@@ -12,12 +33,13 @@ class WeatherService:
     def __init__(self):
         self.settings = get_settings()
 
-    async def get_weather(self, location: str) -> dict:
+    async def get_weather(self, location: str, forecast_days: int = 3) -> dict:
         """
         Fetch current weather and forecast for a location.
         
         Args:
             location: City name, zip code, or lat,lon coordinates
+            forecast_days: Number of forecast days to fetch and return
             
         Returns:
             Weather data formatted for the frontend WeatherWidget
@@ -27,22 +49,22 @@ class WeatherService:
             assert False, "WeatherAPI key not configured"
 
         try:
-            async with httpx.AsyncClient(timeout=self.TIMEOUT) as client:
-                # Get current weather and 4-day forecast
-                response = await client.get(
-                    f"{self.BASE_URL}/forecast.json",
-                    params={
-                        "key": self.settings.weatherapi_key,
-                        "q": location,
-                        "days": 4,
-                        "aqi": "no",
-                        "alerts": "no",
-                    }
-                )
-                response.raise_for_status()
-                data = response.json()
-
-            return self._format_weather_response(data)
+            # Get current weather and only the forecast days we return
+            response = await get_http_client().get(
+                f"{self.BASE_URL}/forecast.json",
+                params={
+                    "key": self.settings.weatherapi_key,
+                    "q": location,
+                    "days": forecast_days,
+                    "aqi": "no",
+                    "alerts": "no",
+                },
+                timeout=self.TIMEOUT,
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            return self._format_weather_response(data, forecast_days)
 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 400:
@@ -60,19 +82,19 @@ class WeatherService:
             print(f"[WeatherService] Error fetching weather: {e}")
             assert False, "WeatherAPI key not configured"
 
-    def _format_weather_response(self, data: dict) -> dict:
+    def _format_weather_response(self, data: dict, forecast_days: int = 3) -> dict:
         """Format WeatherAPI response to match frontend widget expectations."""
         current = data.get("current", {})
         location_data = data.get("location", {})
-        forecast_days = data.get("forecast", {}).get("forecastday", [])
+        forecast_data = data.get("forecast", {}).get("forecastday", [])
 
         # Map condition to icon type
         condition_code = current.get("condition", {}).get("code", 1000)
         icon = self._get_icon_for_condition(condition_code)
 
-        # Format forecast (3 days) - use metric units
+        # Format forecast - use metric units
         forecast = []
-        for day in forecast_days[:3]:
+        for day in forecast_data[:forecast_days]:
             day_data = day.get("day", {})
             forecast.append({
                 "day": self._get_day_name(day.get("date", "")),
@@ -99,32 +121,14 @@ class WeatherService:
 
     def _get_icon_for_condition(self, code: int) -> str:
         """Map WeatherAPI condition codes to frontend icon types."""
-        # Sunny/Clear
-        if code == 1000:
-            return "sun"
-        # Cloudy conditions
-        elif code in [1003, 1006, 1009]:
-            return "cloud"
-        # Rainy/Drizzle conditions
-        elif code in [1063, 1180, 1183, 1186, 1189, 1192, 1195, 1240, 1243, 1246]:
-            return "rain"
-        # Snow conditions
-        elif code in [1066, 1114, 1210, 1213, 1216, 1219, 1222, 1225, 1255, 1258]:
-            return "snow"
-        # Thunderstorm
-        elif code in [1087, 1273, 1276, 1279, 1282]:
-            return "storm"
-        # Default to cloud
-        else:
-            return "cloud"
+        # Unlisted codes default to cloud
+        return _ICON_BY_CODE.get(code, "cloud")
 
     def _get_day_name(self, date_str: str) -> str:
         """Convert date string to day abbreviation."""
-        from datetime import datetime
         try:
-            date = datetime.strptime(date_str, "%Y-%m-%d")
-            return date.strftime("%a")
-        except:
+            return date.fromisoformat(date_str).strftime("%a")
+        except (TypeError, ValueError):
             return "N/A"
 
     def generate_response(self, weather_data: dict, location: str) -> str:
@@ -1,82 +1,302 @@
+import asyncio
 import json
-from typing import Any, Dict
+import logging
+import threading
+import time
+from copy import deepcopy
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.config import get_settings
 from app.services.weather_service import WeatherService
 from app.services.music_service import MusicService
 from app.services.iot_service import IoTService
 from app.services.search_service import SearchService
 
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, frozen=True)
+class ToolResult:
+    """Outcome of a tool call."""
+
+    success: bool
+    response_data: Dict[str, Any]  # Concise data for the LLM
+    ui_data: Optional[Dict[str, Any]]  # Full data for the frontend widget
+    response_text: str  # Spoken summary
+    error: Optional[str] = None
+
+
+# Templates for rejected tool arguments: read-only, handed out via _fresh()
+_ERR_NO_LOCATION = ToolResult(
+    success=False,
+    error="Location is required",
+    response_data=MappingProxyType({"error": "No location provided"}),
+    ui_data=None,
+    response_text="I need a location to check the weather.",
+)
+_ERR_NO_MUSIC_QUERY = ToolResult(
+    success=False,
+    error="Need song, artist, or query",
+    response_data=MappingProxyType({"error": "No search criteria provided"}),
+    ui_data=None,
+    response_text="What would you like me to play?",
+)
+_ERR_NO_ACTION = ToolResult(
+    success=False,
+    error="Action is required",
+    response_data=MappingProxyType({"error": "No action specified"}),
+    ui_data=None,
+    response_text="What would you like me to do with the device?",
+)
+_ERR_NO_SEARCH_QUERY = ToolResult(
+    success=False,
+    error="Query is required",
+    response_data=MappingProxyType({"error": "No search query provided"}),
+    ui_data=None,
+    response_text="What would you like me to search for?",
+)
+# Music search with no playable result; response_text is set per query
+_ERR_NO_MUSIC_FOUND = ToolResult(
+    success=False,
+    error="No results found",
+    response_data=MappingProxyType({"error": "No music found"}),
+    ui_data=None,
+    response_text="",
+)
+
+
+def _fresh(shared: ToolResult, **changes: Any) -> ToolResult:
+    """Copy a shared result (error template or cached) with its own data dicts."""
+    # dict() first: deepcopy can't copy the templates' mappingproxy
+    return replace(
+        shared,
+        response_data=deepcopy(dict(shared.response_data)),
+        ui_data=deepcopy(shared.ui_data),
+        **changes,
+    )
+
+
+# Tool -> (arguments of which at least one must be set, template if none are)
+_REQUIRED_ARGS: Dict[str, Tuple[Tuple[str, ...], ToolResult]] = {
+    "get_weather": (("location",), _ERR_NO_LOCATION),
+    "play_music": (("song", "artist", "query"), _ERR_NO_MUSIC_QUERY),
+    "control_device": (("action",), _ERR_NO_ACTION),
+    "web_search": (("query",), _ERR_NO_SEARCH_QUERY),
+}
+
+# control_device tool action -> IoTService action (anything else toggles)
+_IOT_ACTIONS: Dict[str, str] = {
+    "turn_on": "on",
+    "turn_off": "off",
+    "set_brightness": "set",
+    "set_color": "set",
+}
+
+# control_device tool action -> past-tense text for the spoken confirmation
+_ACTION_TEXT: Dict[str, str] = {
+    "turn_on": "turned on",
+    "turn_off": "turned off",
+    "set_brightness": "set to {brightness}% brightness",
+    "set_color": "changed to {color}",
+}
+
+# Seconds a successful result stays reusable, per read-only tool
+# (control_device changes state, so it is never cached)
+TOOL_CACHE_TTL: Dict[str, float] = {
+    "get_weather": 30.0,
+    "play_music": 300.0,
+    "web_search": 300.0,
+}
+
+
 class ToolExecutor:
     """Executes tool calls and returns results for LLM consumption."""
 
+    # Fixed attribute set (the lazy services are the underscored slots)
+    __slots__ = (
+        "settings",
+        "_weather",
+        "_music",
+        "_iot",
+        "_search",
+        "_cache",
+        "_inflight",
+        "_dispatch",
+    )
+
     def __init__(self):
-        self.weather = WeatherService()
-        self.music = MusicService()
-        self.iot = IoTService()
-        self.search = SearchService()
+        self.settings = get_settings()
+        # Services are created on first use (see the properties below)
+        self._weather: Optional[WeatherService] = None
+        self._music: Optional[MusicService] = None
+        self._iot: Optional[IoTService] = None
+        self._search: Optional[SearchService] = None
+        # Recent results: (tool, args) -> (monotonic time stored, result)
+        self._cache: Dict[tuple, tuple[float, ToolResult]] = {}
+        # Cacheable calls currently running, so duplicates can share them
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+        # Tool name -> handler(args)
+        self._dispatch: Dict[str, Callable[[Dict[str, Any]], Awaitable[ToolResult]]] = {
+            "get_weather": self._execute_weather,
+            "play_music": self._execute_music,
+            "control_device": self._execute_device,
+            "web_search": self._execute_search,
+        }
+
+    @property
+    def weather(self) -> WeatherService:
+        """Lazy initialization of the weather service."""
+        if self._weather is None:
+            self._weather = WeatherService()
+        return self._weather
+
+    @property
+    def music(self) -> MusicService:
+        """Lazy initialization of the music service (sets up YTMusic)."""
+        if self._music is None:
+            self._music = MusicService()
+        return self._music
+
+    @property
+    def iot(self) -> IoTService:
+        """Lazy initialization of the IoT service."""
+        if self._iot is None:
+            self._iot = IoTService()
+        return self._iot
 
-    async def execute(self, tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    @property
+    def search(self) -> SearchService:
+        """Lazy initialization of the search service."""
+        if self._search is None:
+            self._search = SearchService()
+        return self._search
+
+    async def execute(self, tool_name: str, args: Dict[str, Any]) -> ToolResult:
         """
         Execute a tool call and return structured result.
-        
+
+        Repeated read-only calls within the tool's TTL reuse the earlier result.
+
         Args:
             tool_name: Name of the tool to execute
             args: Arguments for the tool
             
         Returns:
-            Dict with response_data (for LLM), ui_data (for frontend), and response_text
+            ToolResult with response_data (for LLM), ui_data (for frontend), and response_text
+        """
+        rejected = self._validate(tool_name, args)
+        if rejected is not None:
+            return rejected
+        return await self._execute_valid(tool_name, args)
+
+    def _validate(self, tool_name: str, args: Dict[str, Any]) -> Optional[ToolResult]:
+        """Return the result for an unknown tool or missing arguments, else None."""
+        if tool_name not in self._dispatch:
+            return ToolResult(
+                success=False,
+                error=f"Unknown tool: {tool_name}",
+                response_data={"error": f"Unknown tool: {tool_name}"},
+                ui_data=None,
+                response_text=f"I don't know how to use the tool '{tool_name}'.",
+            )
+        # At least one of the tool's key arguments must be given
+        names, rejected = _REQUIRED_ARGS[tool_name]
+        if not any(args.get(name) for name in names):
+            return _fresh(rejected)
+        return None
+
+    async def _execute_valid(self, tool_name: str, args: Dict[str, Any]) -> ToolResult:
+        """Execute a validated tool call, reusing cached or in-flight results."""
+        ttl = TOOL_CACHE_TTL.get(tool_name)
+        key = _cache_key(tool_name, args) if ttl is not None else None
+        if key is None:
+            return await self._run(tool_name, args)
+
+        cached = self._cache.get(key)
+        # Cached and joined results are shared, so every caller gets a copy
+        if cached and time.monotonic() - cached[0] < ttl:
+            return _fresh(cached[1])
+
+        # Join an identical call that is already running instead of repeating it
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run_and_cache(key, tool_name, args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller being cancelled doesn't cancel the others
+        return _fresh(await asyncio.shield(task))
+
+    async def _run_and_cache(
+        self, key: tuple, tool_name: str, args: Dict[str, Any]
+    ) -> ToolResult:
+        """Run a cacheable tool call and store its result if it succeeded."""
+        now = time.monotonic()
+        result = await self._run(tool_name, args)
+
+        # Only keep successes; failures should be retried
+        if result.success:
+            cache = self._cache
+            cache.pop(key, None)
+            cache[key] = (now, result)
+            if len(cache) > self.settings.tool_cache_size:
+                del cache[next(iter(cache))]
+
+        return result
+
+    async def execute_many(
+        self, calls: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[ToolResult]:
+        """
+        Execute several tool calls concurrently.
+
+        Args:
+            calls: (tool_name, args) pairs, e.g. all tool calls of one LLM turn
+
+        Returns:
+            One result per call, in call order; a failing call yields an
+            error result instead of cancelling the others
         """
-        # print(f"[ToolExecutor] Executing {tool_name} with args: {args}")
+        # Rejected calls are answered without scheduling a coroutine
+        results = [self._validate(name, args) for name, args in calls]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            outcomes = await asyncio.gather(
+                *(self._execute_valid(*calls[i]) for i in pending),
+                return_exceptions=True,
+            )
+            for i, outcome in zip(pending, outcomes):
+                results[i] = (
+                    _error_result(outcome) if isinstance(outcome, Exception) else outcome
+                )
+        return results
+
+    async def _run(self, tool_name: str, args: Dict[str, Any]) -> ToolResult:
+        """Dispatch a tool call to its service, converting errors to results."""
+        logger.debug("Executing %s with args: %s", tool_name, args)
         
         try:
-            if tool_name == "get_weather":
-                return await self._execute_weather(args)
-            elif tool_name == "play_music":
-                return await self._execute_music(args)
-            elif tool_name == "control_device":
-                return await self._execute_device(args)
-            elif tool_name == "web_search":
-                return await self._execute_search(args)
-            else:
-                return {
-                    "success": False,
-                    "error": f"Unknown tool: {tool_name}",
-                    "response_data": {"error": f"Unknown tool: {tool_name}"},
-                    "ui_data": None,
-                    "response_text": f"I don't know how to use the tool '{tool_name}'.",
-                }
+            return await self._dispatch[tool_name](args)
         except Exception as e:
-            print(f"[ToolExecutor] Error executing {tool_name}: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "response_data": {"error": str(e)},
-                "ui_data": None,
-                "response_text": f"There was an error: {str(e)}",
-            }
-
-    async def _execute_weather(self, args: Dict[str, Any]) -> Dict[str, Any]:
+            logger.exception("Error executing %s", tool_name)
+            return _error_result(e)
+
+    async def _execute_weather(self, args: Dict[str, Any]) -> ToolResult:
         """Execute weather tool."""
-        location = args.get("location", "")
-        if not location:
-            return {
-                "success": False,
-                "error": "Location is required",
-                "response_data": {"error": "No location provided"},
-                "ui_data": None,
-                "response_text": "I need a location to check the weather.",
-            }
+        location = args["location"]
 
         result = await self.weather.get_weather(location)
         
         if result.get("error"):
-            return {
-                "success": False,
-                "error": result["error"],
-                "response_data": result,
-                "ui_data": None,
-                "response_text": f"Couldn't get weather for {location}.",
-            }
+            return ToolResult(
+                success=False,
+                error=result.get("message", "Weather lookup failed"),
+                response_data=result,
+                ui_data=None,
+                response_text=f"Couldn't get weather for {location}.",
+            )
 
         # Format for LLM consumption (concise)
         response_data = {
@@ -85,132 +305,110 @@ class ToolExecutor:
             "condition": result.get("condition"),
             "humidity": result.get("humidity"),
             "wind": result.get("wind"),
-            "forecast": result.get("forecast", [])[:3],  # 3-day forecast
+            "forecast": result.get("forecast", []),  # Already 3 days
         }
 
-        return {
-            "success": True,
-            "response_data": response_data,
-            "ui_data": result,  # Full data for UI widget
-            "response_text": result.get("response_text", ""),
-        }
+        return ToolResult(
+            success=True,
+            response_data=response_data,
+            ui_data=result,  # Full data for UI widget
+            response_text=result.get("response_text", ""),
+        )
 
-    async def _execute_music(self, args: Dict[str, Any]) -> Dict[str, Any]:
+    async def _execute_music(self, args: Dict[str, Any]) -> ToolResult:
         """Execute music tool."""
         song = args.get("song")
         artist = args.get("artist")
         query = args.get("query")
 
         # Build search query
-        search_query = ""
         if song and artist:
             search_query = f"{song} by {artist}"
         elif song:
             search_query = song
         elif artist:
             search_query = f"songs by {artist}"
-        elif query:
-            search_query = query
         else:
-            return {
-                "success": False,
-                "error": "Need song, artist, or query",
-                "response_data": {"error": "No search criteria provided"},
-                "ui_data": None,
-                "response_text": "What would you like me to play?",
-            }
+            search_query = query
 
         try:
             result = await self.music.search(search_query)
         except Exception as e:
-            print(f"[ToolExecutor] Music search error: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "response_data": {"error": "Music search failed"},
-                "ui_data": None,
-                "response_text": f"Couldn't find music for '{search_query}'.",
-            }
+            logger.exception("Music search error for %r", search_query)
+            return ToolResult(
+                success=False,
+                error=str(e),
+                response_data={"error": "Music search failed"},
+                ui_data=None,
+                response_text=f"Couldn't find music for '{search_query}'.",
+            )
         
         # MusicService returns: {title, artist, album, duration, videoId, thumbnailUrl, playlist}
         # Check if we have a valid result with videoId
-        if not result.get("videoId"):
-            return {
-                "success": False,
-                "error": "No results found",
-                "response_data": {"error": "No music found"},
-                "ui_data": None,
-                "response_text": f"Couldn't find music for '{search_query}'.",
-            }
+        video_id = result.get("videoId")
+        if not video_id:
+            return _fresh(
+                _ERR_NO_MUSIC_FOUND,
+                response_text=f"Couldn't find music for '{search_query}'.",
+            )
 
         # Build response data for LLM
+        now_playing = {
+            "title": result.get("title", "Unknown"),
+            "artist": result.get("artist", "Unknown Artist"),
+            "album": result.get("album"),
+            "duration": result.get("duration"),
+            "videoId": video_id,
+        }
         response_data = {
-            "now_playing": {
-                "title": result.get("title", "Unknown"),
-                "artist": result.get("artist", "Unknown Artist"),
-                "album": result.get("album"),
-                "duration": result.get("duration"),
-                "videoId": result.get("videoId"),
-            },
+            "now_playing": now_playing,
             "queue": result.get("playlist", [])
         }
 
-        return {
-            "success": True,
-            "response_data": response_data,
-            "ui_data": result,  # Full data for MusicWidget
-            "response_text": f"Playing {result.get('title', 'music')} by {result.get('artist', 'Unknown')}",
-        }
+        return ToolResult(
+            success=True,
+            response_data=response_data,
+            ui_data=result,  # Full data for MusicWidget
+            response_text=f"Playing {now_playing['title']} by {now_playing['artist']}",
+        )
 
-    async def _execute_device(self, args: Dict[str, Any]) -> Dict[str, Any]:
+    async def _execute_device(self, args: Dict[str, Any]) -> ToolResult:
         """Execute device control tool."""
         action = args.get("action")
         device_name = args.get("device_name")
+        device_names = args.get("device_names")
         room = args.get("room")
         brightness = args.get("brightness")
         color = args.get("color")
 
-        if not action:
-            return {
-                "success": False,
-                "error": "Action is required",
-                "response_data": {"error": "No action specified"},
-                "ui_data": None,
-                "response_text": "What would you like me to do with the device?",
-            }
-
         # Build device identifier - combine device_name and room for better matching
         device_id = device_name or room or "lights"
 
         # Map LLM action to IoT service action
-        iot_action = "toggle"
-        value = None
-        
-        if action == "turn_on":
-            iot_action = "on"
-        elif action == "turn_off":
-            iot_action = "off"
-        elif action == "set_brightness":
-            iot_action = "set"
-            value = brightness or 50
-        elif action == "set_color":
-            iot_action = "set"
-
-        # Call the actual IoT service method
-        result = await self.iot.control_device(
-            device_name=device_id,
-            action=iot_action,
-            value=value,
-            color=color,
-        )
+        iot_action = _IOT_ACTIONS.get(action, "toggle")
+        value = (brightness or 50) if action == "set_brightness" else None
+
+        # Call the actual IoT service method (one call for a list of devices)
+        if isinstance(device_names, list) and device_names:
+            device_id = ", ".join(device_names)
+            result = await self.iot.control_devices(
+                device_names=device_names,
+                action=iot_action,
+                value=value,
+                color=color,
+            )
+        else:
+            result = await self.iot.control_device(
+                device_name=device_id,
+                action=iot_action,
+                value=value,
+                color=color,
+            )
         
         # Format response
-        action_text = {
-            "turn_on": "turned on",
-            "turn_off": "turned off",
-            "set_brightness": f"set to {brightness}% brightness",
-            "set_color": f"changed to {color}",
-        }.get(action, "updated")
+        action_text = _ACTION_TEXT.get(action, "updated").format(
+            brightness=brightness, color=color
+        )
 
         response_text = f"Done! {device_id} has been {action_text}."
 
@@ -219,41 +417,61 @@ class ToolExecutor:
             "devices": result.get("devices", [])
         }
 
-        return {
-            "success": not result.get("error", False),
-            "response_data": {
+        return ToolResult(
+            success=not result.get("error", False),
+            response_data={
                 "action": action,
                 "device": device_id,
                 "result": "success" if not result.get("error") else "error",
                 "results": result.get("results", []),
             },
-            "ui_data": ui_data,
-            "response_text": response_text if not result.get("error") else result.get("message", "Failed to control device"),
-        }
+            ui_data=ui_data,
+            response_text=response_text if not result.get("error") else result.get("message", "Failed to control device"),
+        )
 
-    async def _execute_search(self, args: Dict[str, Any]) -> Dict[str, Any]:
+    async def _execute_search(self, args: Dict[str, Any]) -> ToolResult:
         """Execute web search tool."""
-        query = args.get("query", "")
-        if not query:
-            return {
-                "success": False,
-                "error": "Query is required",
-                "response_data": {"error": "No search query provided"},
-                "ui_data": None,
-                "response_text": "What would you like me to search for?",
-            }
-
+        query = args["query"]
         result = await self.search.search(query)
-        return result
+        return ToolResult(
+            success=result["success"],
+            response_data=result["response_data"],
+            ui_data=result["ui_data"],
+            response_text=result["response_text"],
+            error=result.get("error"),
+        )
+
+
+def _error_result(error: Exception) -> ToolResult:
+    """Build the result returned for a tool call that raised."""
+    return ToolResult(
+        success=False,
+        error=str(error),
+        response_data={"error": str(error)},
+        ui_data=None,
+        response_text=f"There was an error: {str(error)}",
+    )
+
+
+def _cache_key(tool_name: str, args: Dict[str, Any]) -> Optional[tuple]:
+    """Build a result cache key, or None if the args aren't hashable."""
+    try:
+        return (tool_name, frozenset(args.items()))
+    except TypeError:
+        return None
 
 
 # Singleton instance
 _tool_executor: ToolExecutor | None = None
+_tool_executor_lock = threading.Lock()
 
 
 def get_tool_executor() -> ToolExecutor:
     """Get the singleton tool executor instance."""
     global _tool_executor
     if _tool_executor is None:
-        _tool_executor = ToolExecutor()
+        # Double-checked so concurrent first callers can't build two executors
+        with _tool_executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ToolExecutor()
     return _tool_executor
@@ -1,6 +1,8 @@
 """Tests for ConversationContext."""
 
 import pytest
+from datetime import datetime, timedelta
+
 from app.context import ConversationContext, ConversationContextManager
 from app.models import ClassificationResult
 
@@ -131,6 +133,25 @@ class TestConversationContext:
         assert context.collected_slots == {}
         assert len(context.history) == 2  # History preserved
 
+    def test_get_last_user_message(self):
+        """Should return the latest user text, ignoring assistant turns."""
+        context = ConversationContext()
+        classification = ClassificationResult(intent="general_greet", confidence=0.9)
+
+        assert context.get_last_user_message() is None
+
+        context.update("Hello", classification)
+        context.add_assistant_turn("Hi there!")
+        context.update("Tell me a joke", classification)
+        context.add_assistant_turn("Why did the chicken cross the road?")
+
+        assert context.get_last_user_message() == "Tell me a joke"
+        assert context.get_history_and_last_user() == (context.history, "Tell me a joke")
+
+        context.clear_all()
+        assert context.get_last_user_message() is None
+        assert context.get_history_and_last_user() == ([], None)
+
 
 class TestConversationContextManager:
     """Tests for ConversationContextManager class."""
@@ -176,3 +197,34 @@ class TestConversationContextManager:
         # Getting again should create fresh context
         new_context = manager.get_context("user123")
         assert new_context.current_intent is None
+
+    def test_context_manager_evicts_lru(self):
+        """Should drop the least recently used context when full."""
+        manager = ConversationContextManager(max_contexts=2)
+
+        first = manager.get_context("first")
+        second = manager.get_context("second")
+        manager.get_context("first")  # "second" is now least recently used
+
+        manager.get_context("third")
+
+        assert manager.get_context("first") is first
+        assert manager.get_context("second") is not second
+
+    def test_cleanup_old_contexts(self):
+        """Should remove only contexts idle longer than max age."""
+        manager = ConversationContextManager()
+
+        stale = manager.get_context("stale")
+        active = manager.get_context("active")
+        active.last_updated = datetime.now() + timedelta(hours=1)
+
+        removed = manager.cleanup_old_contexts(max_age_seconds=0)
+
+        assert removed == 1
+        assert manager.get_context("active") is active
+        assert manager.get_context("stale") is not stale
+
+        # The active context was requeued, so a later sweep still keeps it
+        manager.cleanup_old_contexts(max_age_seconds=0)
+        assert manager.get_context("active") is active
@@ -1,29 +1,33 @@
 """Tests for AssistantController."""
 
+import warnings
+
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 
 from app.controller import AssistantController
-from app.models import ClassificationResult, AssistantResponse
+from app.models import ClassificationResult, AssistantResponse, IoTAction
 
 
 @pytest.fixture
 def controller():
     """Create controller with mocked dependencies."""
-    with patch("app.controller.get_classifier_client") as mock_classifier:
-        with patch("app.controller.get_context_manager") as mock_context_mgr:
-            # Setup mock classifier
-            mock_client = AsyncMock()
-            mock_classifier.return_value = mock_client
+    with (
+        patch("app.controller.get_classifier_client") as mock_classifier,
+        patch("app.controller.get_context_manager") as mock_context_mgr,
+    ):
+        # Setup mock classifier
+        mock_client = AsyncMock()
+        mock_classifier.return_value = mock_client
 
-            # Setup mock context manager
-            from app.context import ConversationContextManager
+        # Setup mock context manager
+        from app.context import ConversationContextManager
 
-            mock_context_mgr.return_value = ConversationContextManager()
+        mock_context_mgr.return_value = ConversationContextManager()
 
-            controller = AssistantController()
-            controller.classifier = mock_client
-            yield controller
+        controller = AssistantController()
+        controller.classifier = mock_client
+        yield controller
 
 
 class TestAssistantController:
@@ -33,12 +37,10 @@ class TestAssistantController:
     async def test_weather_two_turn_flow(self, controller):
         """Test: 'What's the weather?' -> ask location -> city -> returns weather."""
         # First turn: No location provided
-        controller.classifier.classify = AsyncMock(
-            return_value=ClassificationResult(
-                intent="weather_query",
-                confidence=0.95,
-                slots={},
-            )
+        controller.classifier.classify.return_value = ClassificationResult(
+            intent="weather_query",
+            confidence=0.95,
+            slots={},
         )
 
         response1 = await controller.process_input("user1", "What's the weather?")
@@ -48,12 +50,10 @@ class TestAssistantController:
         assert "city" in response1.follow_up_question.lower()
 
         # Second turn: Location provided
-        controller.classifier.classify = AsyncMock(
-            return_value=ClassificationResult(
-                intent="weather_query",
-                confidence=0.95,
-                slots={"location": "New York"},
-            )
+        controller.classifier.classify.return_value = ClassificationResult(
+            intent="weather_query",
+            confidence=0.95,
+            slots={"location": "New York"},
         )
 
         response2 = await controller.process_input("user1", "New York")
@@ -67,12 +67,10 @@ class TestAssistantController:
     async def test_iot_light_flow(self, controller):
         """Test: 'Turn on lights' -> ask device -> device name -> returns confirmation."""
         # First turn: No device specified
-        controller.classifier.classify = AsyncMock(
-            return_value=ClassificationResult(
-                intent="iot_hue_lighton",
-                confidence=0.92,
-                slots={},
-            )
+        controller.classifier.classify.return_value = ClassificationResult(
+            intent="iot_hue_lighton",
+            confidence=0.92,
+            slots={},
         )
 
         response1 = await controller.process_input("user2", "Turn on the lights")
@@ -82,12 +80,10 @@ class TestAssistantController:
         assert response1.follow_up_question is not None
 
         # Second turn: Device provided
-        controller.classifier.classify = AsyncMock(
-            return_value=ClassificationResult(
-                intent="iot_hue_lighton",
-                confidence=0.92,
-                slots={"device_name": "living room lights"},
-            )
+        controller.classifier.classify.return_value = ClassificationResult(
+            intent="iot_hue_lighton",
+            confidence=0.92,
+            slots={"device_name": "living room lights"},
         )
 
         response2 = await controller.process_input("user2", "living room lights")
@@ -99,12 +95,10 @@ class TestAssistantController:
     @pytest.mark.asyncio
     async def test_music_play_direct(self, controller):
         """Test: Music play with no required slots completes immediately."""
-        controller.classifier.classify = AsyncMock(
-            return_value=ClassificationResult(
-                intent="play_music",
-                confidence=0.88,
-                slots={"artist": "The Weeknd"},
-            )
+        controller.classifier.classify.return_value = ClassificationResult(
+            intent="play_music",
+            confidence=0.88,
+            slots={"artist": "The Weeknd"},
         )
 
         response = await controller.process_input("user3", "Play The Weeknd")
@@ -116,13 +110,11 @@ class TestAssistantController:
     @pytest.mark.asyncio
     async def test_low_confidence_clarification(self, controller):
         """Test: Low confidence triggers clarification request."""
-        controller.classifier.classify = AsyncMock(
-            return_value=ClassificationResult(
-                intent="play_music",
-                confidence=0.4,  # Below threshold
-                slots={},
-                needs_clarification=True,
-            )
+        controller.classifier.classify.return_value = ClassificationResult(
+            intent="play_music",
+            confidence=0.4,  # Below threshold
+            slots={},
+            needs_clarification=True,
         )
 
         response = await controller.process_input("user4", "play something")
@@ -133,12 +125,10 @@ class TestAssistantController:
     @pytest.mark.asyncio
     async def test_general_greeting(self, controller):
         """Test: General greeting returns ai_response mode."""
-        controller.classifier.classify = AsyncMock(
-            return_value=ClassificationResult(
-                intent="general_greet",
-                confidence=0.98,
-                slots={},
-            )
+        controller.classifier.classify.return_value = ClassificationResult(
+            intent="general_greet",
+            confidence=0.98,
+            slots={},
         )
 
         response = await controller.process_input("user5", "Hello!")
@@ -146,3 +136,45 @@ class TestAssistantController:
         assert response.state == "completed"
         assert response.ui_mode == "ai_response"
         assert "hello" in response.response.lower() or "help" in response.response.lower()
+
+    @pytest.mark.asyncio
+    async def test_completed_response_matches_schema(self, controller):
+        """Test: Handler responses built without validation still fit the models."""
+        controller.classifier.classify.return_value = ClassificationResult(
+            intent="iot_hue_lighton",
+            confidence=0.95,
+            slots={"device_type": "lights", "house_place": "kitchen"},
+        )
+
+        response = await controller.process_input("user6", "Turn on the kitchen lights")
+
+        assert response.state == "completed"
+        assert response.intent == "iot_hue_lighton"
+        assert isinstance(response.action, IoTAction)
+        assert response.action.type == "iot"
+
+        # Serializing must not hit type mismatches, and the output must validate
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            dumped = response.model_dump()
+        assert AssistantResponse.model_validate(dumped).model_dump() == dumped
+
+
+def test_get_controller_evicts_lru():
+    """Test: The per-user controller cache drops the least recently used user."""
+    from app import controller as controller_module
+
+    with (
+        patch.object(controller_module, "_controllers", controller_module.OrderedDict()),
+        patch.object(controller_module, "MAX_CONTROLLERS", 2),
+    ):
+        first = controller_module.get_controller("a")
+        controller_module.get_controller("b")
+        assert controller_module.get_controller("a") is first  # "a" is now most recent
+        controller_module.get_controller("c")
+
+        assert list(controller_module._controllers) == ["a", "c"]
+        # Stateless services are shared, per-user state is not
+        assert first.weather_service is controller_module.get_controller("c").weather_service
+        assert first.iot_service is not controller_module.get_controller("c").iot_service
+
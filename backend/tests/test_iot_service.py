@@ -0,0 +1,25 @@
+"""Tests for IoTService."""
+
+import pytest
+
+from app.services import IoTService
+
+
+class TestIoTService:
+    """Tests for IoTService class."""
+
+    @pytest.mark.parametrize(
+        ("phrase", "expected"),
+        [
+            ("thermostat and lights", ["Thermostat"]),
+            ("security camera light", ["Security Camera"]),
+            ("lights", ["Living Room Lights", "Bedroom Lights", "Kitchen Lights"]),
+            ("front door lock", ["Front Door Lock"]),
+        ],
+    )
+    def test_find_devices_matches_names_across_types(self, phrase, expected):
+        """A device named in the phrase matches even if the phrase names another type."""
+        iot = IoTService(user_id="find-devices")
+        devices = iot._get_devices()
+
+        assert [d.name for d in iot._find_devices(devices, phrase)] == expected